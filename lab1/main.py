@@ -1,7 +1,14 @@
 import random
 import time
 import itertools
-import matplotlib.pyplot as plt
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
 
 RANDOM_SEED = 42 # счетчик псевдослучайных чисел
 random.seed(RANDOM_SEED)
@@ -50,17 +57,32 @@ POPULATION_SIZE = 200 # размер популяции
 P_CROSSOVER = 0.9 # вероятность скрещивания
 P_MUTATION = 0.2 # вероятность мутации
 MAX_GENERATIONS = 80 # макс кол поколений итераций работы алгоритма ( для проверки условия остановки )
+# Критерии ранней остановки (None — критерий отключён); срабатывание записывается в "stop_reason"
+STAGNATION_GENERATIONS = None # остановка, если макс. приспособленность не растёт столько поколений
+MIN_DIVERSITY = None # остановка, если доля различных геномов в популяции ниже порога (0..1)
+TIME_BUDGET = None # остановка по времени работы одного запуска, сек
+TARGET_DEVIATION = 0.0 # остановка, если найдено решение с отклонением не больше заданного
+GENOME = "list" # представление генома: "list" (Individual) или "bits" (BitIndividual, битовая маска)
+SEEDS_PER_EXPERIMENT = 1 # число независимых повторов каждого эксперимента (разные seed)
+FITNESS_CACHE_SIZE = 100000 # макс. число геномов в LRU-кэше приспособленности (0 — без кэша)
+PROCESSES = None # число процессов для сетки экспериментов (None — все ядра, 1 — последовательно)
+ISLAND_MODE = False # дополнительно запустить островную модель (острова — пары операторов из experiments)
+ISLAND_MIGRATION_INTERVAL = 10 # островная модель: поколений между миграциями
+ISLAND_MIGRANTS = 2 # островная модель: сколько лучших особей отправляет каждый остров
+ISLAND_TOPOLOGY = "ring" # островная модель: "ring" (кольцо) или "full" (все со всеми)
 
 # ================ Структуры =================
 class FitnessMin():
     def __init__(self):
         # fitness будет 1/(1+deviation) — больше лучше
         self.values = [0.0] # хранит значение приспособленности
+        self.dirty = True # геном изменён после последней оценки — нужна переоценка
 
 class Individual(list):
     def __init__(self, *args):
         super().__init__(*args)
         self.fitness = FitnessMin()
+        self.sums = None # накопленные (цена, calories, protein, fat, carbs) или None, если неизвестны
 
 # ================ Функции оценки: характеристики, цена, deviation =================
 def get_item_features(index):
@@ -97,8 +119,68 @@ def individualCreator():
 def populationCreator(n=0):
     return [individualCreator() for _ in range(n)]
 
+# ================ Кэш приспособленности (LRU по геному) =================
+class FitnessCache():
+    """Ограниченный LRU-кэш: ключ — геном в виде битовой маски, значение — кортеж приспособленности
+    и (если известны) суммы цены и характеристик для дельта-оценки"""
+    def __init__(self, maxsize=FITNESS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """(приспособленность, суммы или None) либо None при промахе"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, values, sums=None):
+        self.entries[key] = (values, sums)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+def genome_key(individual):
+    """Битовая маска генома (бит i — ген i)"""
+    if isinstance(individual, BitIndividual):
+        return individual.bits
+    key = 0
+    for i, g in enumerate(individual):
+        if g == 1:
+            key |= 1 << i
+    return key
+
 # ================ Fitness-функция (приведение ошибки к метрике пригодности) =================
-def evaluateIndividual(individual):
+def evaluateIndividual(individual, cache=None):
+    if cache is not None:
+        key = genome_key(individual)
+        values = cache.get(key)
+        if values is not None:
+            return values
+        values = evaluateIndividual(individual)
+        cache.put(key, values)
+        return values
     indices = [i for i, g in enumerate(individual) if g == 1] # Индексы где стоит 1
     total_price, totals = evaluate_selected(indices)
     # если вне бюджетных рамок — применим штраф (сильно ухудшаем приспособленность)
@@ -110,10 +192,109 @@ def evaluateIndividual(individual):
     fitness_value = 1.0 / (1.0 + dev)  # преобразование в приспособленность - максимизируем
     return (fitness_value,)
 
+# ================ Векторизованная оценка всей популяции (NumPy) =================
+# Матрица характеристик продуктов (N x (1+m)): столбец 0 — цена, далее calories, protein, fat, carbs
+PRODUCT_MATRIX = np.array([product[1:] for product in PRODUCTS], dtype=float)
+TARGET_VECTOR = np.array([TARGET["calories"], TARGET["protein"], TARGET["fat"], TARGET["carbs"]], dtype=float)
+
+def population_matrix(population):
+    """Превращает популяцию в матрицу 0/1 размера (pop x N)"""
+    if population and isinstance(population[0], BitIndividual):
+        return bits_matrix([ind.bits for ind in population]).astype(float)
+    return np.asarray(population, dtype=float).reshape(len(population), N)
+
+def deviation_from_target_batch(totals):
+    """Векторный аналог deviation_from_target для матрицы сумм (pop x m)"""
+    return np.sum((totals - TARGET_VECTOR)**2, axis=1)
+
+def population_sums(population):
+    """Матрица сумм (pop x (1+m)): цена и характеристики каждой особи одним матричным произведением"""
+    return population_matrix(population) @ PRODUCT_MATRIX
+
+def evaluate_population(population):
+    """Оценивает всю популяцию одним матричным произведением, возвращает массив приспособленностей"""
+    return fitness_from_sums(population_sums(population))
+
+def fitness_from_sums(sums):
+    """Приспособленность по матрице сумм (pop x (1+m)) — не зависит от N"""
+    prices, totals = sums[:, 0], sums[:, 1:]
+    dev = deviation_from_target_batch(totals)
+    # тот же штраф за выход из бюджета, что и в evaluateIndividual
+    out_of_budget = (prices < MIN_BUDGET) | (prices > MAX_BUDGET)
+    penalty = 1e6 + np.abs(prices - (MIN_BUDGET+MAX_BUDGET)/2)*1e3
+    dev = dev + np.where(out_of_budget, penalty, 0.0)
+    return 1.0 / (1.0 + dev)
+
+def assign_fitness(population, cache=None):
+    """Оценка поколения за один вызов evaluate_population.
+    Нетронутые клоны (dirty=False) сохраняют приспособленность родителя без поиска в кэше;
+    из остальных в матричный расчёт попадают только промахи кэша."""
+    pending = []
+    for ind in population:
+        if not ind.fitness.dirty:
+            continue
+        entry = cache.get_entry(genome_key(ind)) if cache is not None else None
+        if entry is not None:
+            ind.fitness.values, sums = entry
+            ind.fitness.dirty = False
+            if ind.sums is None:
+                ind.sums = sums
+        else:
+            pending.append(ind)
+    if not pending:
+        return
+    # суммы, поддерживаемые операторами инкрементально, берутся как есть; остальные — матричным расчётом
+    unknown = [ind for ind in pending if ind.sums is None]
+    if unknown:
+        for ind, row in zip(unknown, population_sums(unknown).tolist()):
+            ind.sums = tuple(row)
+    for ind, fv in zip(pending, fitness_from_sums(np.array([ind.sums for ind in pending]))):
+        ind.fitness.values = (float(fv),)
+        ind.fitness.dirty = False
+        if cache is not None:
+            cache.put(genome_key(ind), ind.fitness.values, ind.sums)
+
+# ================ Инкрементальная (дельта) оценка =================
+# Особи хранят суммы цены и характеристик; мутации, ремонт и скрещивание обновляют их за O(изменённых генов).
+# Суммы None (неизвестны) пересчитываются матрично при оценке.
+PRODUCT_ROWS = [tuple(row) for row in PRODUCT_MATRIX.tolist()]
+
+def update_sums(ind, i, gene):
+    """Учитывает в суммах особи установку гена i в значение gene"""
+    if ind.sums is None:
+        return
+    if gene == 1:
+        ind.sums = tuple(total + value for total, value in zip(ind.sums, PRODUCT_ROWS[i]))
+    else:
+        ind.sums = tuple(total - value for total, value in zip(ind.sums, PRODUCT_ROWS[i]))
+
+def swap_sums(child1, child2, gained, lost):
+    """Суммы после обмена генами: child1 получил единицы в gained и потерял в lost, child2 — наоборот"""
+    delta = [0.0] * len(PRODUCT_ROWS[0])
+    for i in gained:
+        delta = [d + value for d, value in zip(delta, PRODUCT_ROWS[i])]
+    for i in lost:
+        delta = [d - value for d, value in zip(delta, PRODUCT_ROWS[i])]
+    if child1.sums is not None:
+        child1.sums = tuple(total + d for total, d in zip(child1.sums, delta))
+    if child2.sums is not None:
+        child2.sums = tuple(total - d for total, d in zip(child2.sums, delta))
+
+def _swap_genes(child1, child2, positions):
+    """Обмен генами в позициях positions с обновлением сумм"""
+    gained, lost = [], []
+    for i in positions:
+        if child1[i] != child2[i]:
+            (gained if child2[i] == 1 else lost).append(i)
+            child1[i], child2[i] = child2[i], child1[i]
+    swap_sums(child1, child2, gained, lost)
+
 # ================ Клонирование  =================
 def clone(value):
     ind = Individual(value[:])
     ind.fitness.values[0] = value.fitness.values[0]
+    ind.fitness.dirty = value.fitness.dirty
+    ind.sums = value.sums # кортеж неизменяем — можно разделять с родителем
     return ind
 
 # ================ Отбор — турнир  =================
@@ -128,18 +309,16 @@ def selTournament(population, p_len, tournsize=3):
 # ================ Операторы скрещивания  =================
 def cxOnePoint(child1, child2):
     s = random.randint(1, N-1)
-    child1[s:], child2[s:] = child2[s:], child1[s:]
+    _swap_genes(child1, child2, range(s, N))
     # после скрещивания возможное нарушение ровно K единиц — чинится в repair_operator
 
 def cxTwoPoint(child1, child2):
     a = random.randint(1, N-2)
     b = random.randint(a+1, N-1)
-    child1[a:b], child2[a:b] = child2[a:b], child1[a:b]
+    _swap_genes(child1, child2, range(a, b))
 
 def cxUniform(child1, child2, indpb=0.5):
-    for i in range(N):
-        if random.random() < indpb:
-            child1[i], child2[i] = child2[i], child1[i]
+    _swap_genes(child1, child2, [i for i in range(N) if random.random() < indpb])
 
 # ================ Операторы мутации  =================
 # точечная мутация
@@ -147,6 +326,7 @@ def mutFlipBit(mutant, indpb=0.05):
     for i in range(N):
         if random.random() < indpb:
             mutant[i] = 0 if mutant[i] == 1 else 1
+            update_sums(mutant, i, mutant[i])
 # обменная мутация
 def mutSwap(mutant):
     ones = [i for i, v in enumerate(mutant) if v == 1]
@@ -155,6 +335,8 @@ def mutSwap(mutant):
         i = random.choice(ones)
         j = random.choice(zeros)
         mutant[i], mutant[j] = mutant[j], mutant[i]
+        update_sums(mutant, i, 0)
+        update_sums(mutant, j, 1)
 # перемешивающая мутация
 def mutScramble(mutant):
     # (после ремонта нужно восстановить K)
@@ -162,6 +344,9 @@ def mutScramble(mutant):
     b = random.randint(a+1, N-1)
     segment = mutant[a:b]
     random.shuffle(segment)
+    for i, (old, new) in enumerate(zip(mutant[a:b], segment)):
+        if old != new:
+            update_sums(mutant, a + i, new)
     mutant[a:b] = segment
 
 # ================ Repair (восстановление ровно K единиц) =================
@@ -174,23 +359,288 @@ def repair_to_k(ind):
         remove = random.sample(ones, int(current - K))
         for i in remove:
             ind[i] = 0
+            update_sums(ind, i, 0)
     elif current < K:
         zeros = [i for i, v in enumerate(ind) if v == 0]
         add = random.sample(zeros, int(K - current))
         for i in add:
             ind[i] = 1
+            update_sums(ind, i, 1)
     # если равны — ничего не делаем
 
+# ================ Компактный геном: целочисленная битовая маска =================
+# Ген i хранится в бите i целого числа: память и клонирование — O(N/64) машинных слов
+# вместо списка из N Python-объектов. Операторы ниже — побитовые аналоги операторов для списка.
+FULL_MASK = (1 << N) - 1
+
+class BitFitness():
+    __slots__ = ("values", "dirty")
+
+    def __init__(self, values=(0.0,), dirty=True):
+        self.values = values # кортеж неизменяем — клоны могут разделять его с родителем
+        self.dirty = dirty
+
+class BitIndividual():
+    __slots__ = ("bits", "fitness", "sums")
+
+    def __init__(self, bits=0, values=(0.0,), dirty=True, sums=None):
+        self.bits = bits
+        self.fitness = BitFitness(values, dirty)
+        self.sums = sums
+
+    # последовательный интерфейс, как у Individual (нужен для вывода решений)
+    def __len__(self):
+        return N
+
+    def __getitem__(self, i):
+        return (self.bits >> i) & 1
+
+    def __iter__(self):
+        return ((self.bits >> i) & 1 for i in range(N))
+
+def bits_matrix(masks):
+    """Распаковывает список масок в матрицу 0/1 (pop x N) типа uint8"""
+    n_bytes = (N + 7) // 8
+    packed = np.frombuffer(b"".join(mask.to_bytes(n_bytes, "little") for mask in masks), dtype=np.uint8)
+    return np.unpackbits(packed.reshape(len(masks), n_bytes), axis=1, bitorder="little")[:, :N]
+
+def _positions(bits, value):
+    """Индексы генов со значением value"""
+    return [i for i in range(N) if (bits >> i) & 1 == value]
+
+def _mask_positions(mask):
+    """Индексы установленных битов маски — O(числа единиц)"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def bitIndividualCreator():
+    """Маска длины N с ровно K единицами"""
+    bits = 0
+    for i in random.sample(range(N), K):
+        bits |= 1 << i
+    return BitIndividual(bits)
+
+def bitPopulationCreator(n=0):
+    return [bitIndividualCreator() for _ in range(n)]
+
+def clone_bits(value):
+    return BitIndividual(value.bits, value.fitness.values, value.fitness.dirty, value.sums)
+
+def _swap_masked(child1, child2, mask):
+    diff = (child1.bits ^ child2.bits) & mask
+    gained, lost = diff & child2.bits, diff & child1.bits
+    child1.bits ^= diff
+    child2.bits ^= diff
+    swap_sums(child1, child2, _mask_positions(gained), _mask_positions(lost))
+
+def cxOnePointMask(child1, child2):
+    s = random.randint(1, N-1)
+    _swap_masked(child1, child2, FULL_MASK ^ ((1 << s) - 1))
+
+def cxTwoPointMask(child1, child2):
+    a = random.randint(1, N-2)
+    b = random.randint(a+1, N-1)
+    _swap_masked(child1, child2, ((1 << b) - 1) ^ ((1 << a) - 1))
+
+def cxUniformMask(child1, child2, indpb=0.5):
+    mask = 0
+    for i in range(N):
+        if random.random() < indpb:
+            mask |= 1 << i
+    _swap_masked(child1, child2, mask)
+
+def mutFlipBitMask(mutant, indpb=0.05):
+    mask = 0
+    for i in range(N):
+        if random.random() < indpb:
+            mask |= 1 << i
+    mutant.bits ^= mask
+    for i in _mask_positions(mask):
+        update_sums(mutant, i, (mutant.bits >> i) & 1)
+
+def mutSwapMask(mutant):
+    ones = _positions(mutant.bits, 1)
+    zeros = _positions(mutant.bits, 0)
+    if ones and zeros:
+        i = random.choice(ones)
+        j = random.choice(zeros)
+        mutant.bits ^= (1 << i) | (1 << j)
+        update_sums(mutant, i, 0)
+        update_sums(mutant, j, 1)
+
+def mutScrambleMask(mutant):
+    # перемешивание отрезка [a, b) сохраняет число единиц в нём — достаточно заново разложить их
+    a = random.randint(0, N-2)
+    b = random.randint(a+1, N-1)
+    segment_mask = ((1 << b) - 1) ^ ((1 << a) - 1)
+    count = (mutant.bits & segment_mask).bit_count()
+    segment = 0
+    for i in random.sample(range(a, b), count):
+        segment |= 1 << i
+    changed = (mutant.bits & segment_mask) ^ segment
+    mutant.bits = (mutant.bits & ~segment_mask) | segment
+    for i in _mask_positions(changed):
+        update_sums(mutant, i, (segment >> i) & 1)
+
+def repair_mask_to_k(ind):
+    """Аналог repair_to_k: число единиц считается через popcount"""
+    current = ind.bits.bit_count()
+    if current > K:
+        for i in random.sample(_positions(ind.bits, 1), current - K):
+            ind.bits &= ~(1 << i)
+            update_sums(ind, i, 0)
+    elif current < K:
+        for i in random.sample(_positions(ind.bits, 0), K - current):
+            ind.bits |= 1 << i
+            update_sums(ind, i, 1)
+
+# ================ Представления генома для run_ga =================
+# operators переводит операторы списка (из experiments) в аналоги для данного представления
+GENOMES = {
+    "list": {
+        "population": populationCreator,
+        "clone": clone,
+        "repair": repair_to_k,
+        "operators": {},
+    },
+    "bits": {
+        "population": bitPopulationCreator,
+        "clone": clone_bits,
+        "repair": repair_mask_to_k,
+        "operators": {
+            cxOnePoint: cxOnePointMask,
+            cxTwoPoint: cxTwoPointMask,
+            cxUniform: cxUniformMask,
+            mutFlipBit: mutFlipBitMask,
+            mutSwap: mutSwapMask,
+            mutScramble: mutScrambleMask,
+        },
+    },
+}
+
+# ================ Критерии остановки =================
+# Критерий получает состояние запуска (generation, max_values, mean_values, population, start_time)
+# и возвращает True, если пора остановиться. Критерии — классы, чтобы передаваться в процессы пула.
+class NoImprovement():
+    name = "no_improvement"
+
+    def __init__(self, generations):
+        self.generations = generations
+
+    def __call__(self, state):
+        history = state["max_values"]
+        return len(history) > self.generations and \
+            max(history[-self.generations:]) <= max(history[:-self.generations])
+
+class LowDiversity():
+    name = "low_diversity"
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def __call__(self, state):
+        population = state["population"]
+        return len({genome_key(ind) for ind in population}) / len(population) < self.threshold
+
+class TimeBudget():
+    name = "time_budget"
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, state):
+        return time.time() - state["start_time"] >= self.seconds
+
+class TargetDeviation():
+    name = "target_deviation"
+
+    def __init__(self, deviation):
+        self.deviation = deviation
+
+    def __call__(self, state):
+        # при deviation = 0 — прежнее условие "идеального решения"
+        return state["max_values"][-1] > 1.0/(1.0+self.deviation) - 1e-12
+
+def default_stop_criteria():
+    """Критерии остановки из параметров STAGNATION_GENERATIONS, MIN_DIVERSITY, TIME_BUDGET, TARGET_DEVIATION"""
+    criteria = []
+    if STAGNATION_GENERATIONS is not None:
+        criteria.append(NoImprovement(STAGNATION_GENERATIONS))
+    if MIN_DIVERSITY is not None:
+        criteria.append(LowDiversity(MIN_DIVERSITY))
+    if TIME_BUDGET is not None:
+        criteria.append(TimeBudget(TIME_BUDGET))
+    if TARGET_DEVIATION is not None:
+        criteria.append(TargetDeviation(TARGET_DEVIATION))
+    return criteria
+
+def check_stop(criteria, state):
+    """Имя первого сработавшего критерия или None"""
+    for criterion in criteria:
+        if criterion(state):
+            return criterion.name
+    return None
+
 # ================ Основной цикл GA с возможностью выбора операторов =================
-def run_ga(crossover_operator, mutation_operator, run_name="run", verbose=False):
+def resolve_operators(crossover_operator, mutation_operator, genome="list"):
+    """Представление генома и операторы из experiments, заменённые на аналоги для него"""
+    backend = GENOMES[genome]
+    operators = {
+        "crossover": backend["operators"].get(crossover_operator, crossover_operator),
+        "mutation": backend["operators"].get(mutation_operator, mutation_operator),
+        "flip_bit": mutation_operator in (mutFlipBit, mutFlipBitMask),
+    }
+    return backend, operators
+
+def next_generation(population, backend, operators, cache=None):
+    """Одно поколение: селекция, скрещивание, мутация, ремонт и оценка потомков"""
+    repair = backend["repair"]
+
+    # селекция
+    offspring = selTournament(population, len(population))
+    offspring = list(map(backend["clone"], offspring))
+
+    # скрещивание
+    for child1, child2 in zip(offspring[::2], offspring[1::2]):
+        if random.random() < P_CROSSOVER:
+            operators["crossover"](child1, child2)
+            child1.fitness.dirty = child2.fitness.dirty = True
+            # ремонт - чтобы сохранить ровно K единиц
+            repair(child1)
+            repair(child2)
+
+    # мутация
+    for mutant in offspring:
+        if random.random() < P_MUTATION:
+            if operators["flip_bit"]:
+                operators["mutation"](mutant, indpb=1.0/N)
+            else:
+                operators["mutation"](mutant)
+            repair(mutant)
+            mutant.fitness.dirty = True
+
+    # оценка (изменённые особи, промахи кэша — одним матричным вызовом)
+    assign_fitness(offspring, cache)
+    return offspring
+
+def run_ga(crossover_operator, mutation_operator, run_name="run", verbose=False, genome="list",
+           stop_criteria=None, on_generation=None):
+    """Один запуск GA. on_generation(поколение, макс, среднее) вызывается после каждого поколения."""
+    backend, operators = resolve_operators(crossover_operator, mutation_operator, genome)
+    cache = FitnessCache(FITNESS_CACHE_SIZE) if FITNESS_CACHE_SIZE else None
+    if stop_criteria is None:
+        stop_criteria = default_stop_criteria()
+    start_time = time.time()
+    stop_reason = "max_generations"
+
     # инициализация
-    population = populationCreator(POPULATION_SIZE)
+    population = backend["population"](POPULATION_SIZE)
     generationCounter = 0
 
     # оценка начальной популяции
-    fitnessValues = list(map(evaluateIndividual, population))
-    for ind, fv in zip(population, fitnessValues):
-        ind.fitness.values = fv
+    assign_fitness(population, cache)
 
     maxFitnessValues = []
     meanFitnessValues = []
@@ -199,47 +649,33 @@ def run_ga(crossover_operator, mutation_operator, run_name="run", verbose=False)
     while generationCounter < MAX_GENERATIONS:
         generationCounter += 1
 
-        # селекция
-        offspring = selTournament(population, len(population))
-        offspring = list(map(clone, offspring))
-
-        # скрещивание
-        for child1, child2 in zip(offspring[::2], offspring[1::2]):
-            if random.random() < P_CROSSOVER:
-                crossover_operator(child1, child2)
-                # ремонт - чтобы сохранить ровно K единиц
-                repair_to_k(child1)
-                repair_to_k(child2)
-
-        # мутация
-        for mutant in offspring:
-            if random.random() < P_MUTATION:
-                if mutation_operator == mutFlipBit:
-                    mutation_operator(mutant, indpb=1.0/N)
-                else:
-                    mutation_operator(mutant)
-                repair_to_k(mutant)
-
-        # оценка
-        freshFitness = list(map(evaluateIndividual, offspring))
-        for ind, fv in zip(offspring, freshFitness):
-            ind.fitness.values = fv
-
-        population[:] = offspring
+        population[:] = next_generation(population, backend, operators, cache)
 
         fitnessValues = [ind.fitness.values[0] for ind in population]
         maxFitness = max(fitnessValues)
         meanFitness = sum(fitnessValues) / len(population)
         maxFitnessValues.append(maxFitness)
         meanFitnessValues.append(meanFitness)
+        if on_generation is not None:
+            on_generation(generationCounter, maxFitness, meanFitness)
 
         if verbose:
             best_index = fitnessValues.index(maxFitness)
             best = population[best_index]
             print(f"{run_name} Поколение {generationCounter}: Макс = {maxFitness:.8f}, Ср = {meanFitness:.8f}")
 
-        # ранняя остановка если нашли идеальное решение (допустим отклонение 0)
-        if maxFitnessValues[-1] > 1.0/(1.0+0.0) - 1e-12: #0.999999999999
+        # ранняя остановка по критериям (по умолчанию — найдено идеальное решение, отклонение 0)
+        reason = check_stop(stop_criteria, {
+            "generation": generationCounter,
+            "max_values": maxFitnessValues,
+            "mean_values": meanFitnessValues,
+            "population": population,
+            "start_time": start_time
+        })
+        if reason is not None:
+            stop_reason = reason
+            if verbose:
+                print(f"{run_name} Остановка: {stop_reason}")
             break
 
     # вернём популяцию + метрики
@@ -247,7 +683,9 @@ def run_ga(crossover_operator, mutation_operator, run_name="run", verbose=False)
         "population": population,
         "max_values": maxFitnessValues,
         "mean_values": meanFitnessValues,
-        "generations": generationCounter
+        "generations": generationCounter,
+        "stop_reason": stop_reason,
+        "cache": cache.stats() if cache is not None else None
     }
 
 # ================ Полный перебор (комбинации C(N,K)) =================
@@ -269,6 +707,72 @@ def exhaustive_search():
     elapsed = time.time() - start
     return best_combo, best_dev, combos_checked, elapsed
 
+# ================ Точный поиск: метод ветвей и границ =================
+def _suffix_bounds(values, k):
+    """Для каждого начала суффикса i и числа r <= k: (мин, макс) сумма r значений из values[i:]"""
+    n = len(values)
+    lows = [[0.0]*(k+1) for _ in range(n+1)]
+    highs = [[0.0]*(k+1) for _ in range(n+1)]
+    for i in range(n):
+        ordered = sorted(values[i:])
+        for r in range(1, min(k, n-i)+1):
+            lows[i][r] = lows[i][r-1] + ordered[r-1]
+            highs[i][r] = highs[i][r-1] + ordered[-r]
+    return lows, highs
+
+def branch_and_bound_search():
+    """Точный поиск той же оптимальной комбинации, что и exhaustive_search, с отсечением ветвей:
+    по бюджету (мин/макс достижимая цена) и по нижней оценке отклонения для каждой характеристики.
+    Комбинации обходятся в том же лексикографическом порядке, поэтому при равных отклонениях
+    возвращается та же комбинация, что и при полном переборе."""
+    start = time.time()
+    target = (TARGET["calories"], TARGET["protein"], TARGET["fat"], TARGET["carbs"])
+    features = [get_item_features(i) for i in range(N)]
+    price_low, price_high = _suffix_bounds([price for price, _ in features], K)
+    feature_bounds = [_suffix_bounds([f[j] for _, f in features], K) for j in range(m)]
+
+    best = {"dev": float("inf"), "combo": None, "checked": 0}
+
+    def deviation_lower_bound(first, r, totals):
+        # каждая характеристика независимо может попасть в интервал [lo, hi] — оценка снизу
+        bound = 0.0
+        for j in range(m):
+            lows, highs = feature_bounds[j]
+            lo = totals[j] + lows[first][r]
+            hi = totals[j] + highs[first][r]
+            if target[j] < lo:
+                bound += (lo - target[j])**2
+            elif target[j] > hi:
+                bound += (target[j] - hi)**2
+        return bound
+
+    def branch(first, r, price, totals, chosen):
+        if r == 0:
+            best["checked"] += 1
+            if price < MIN_BUDGET or price > MAX_BUDGET:
+                return
+            dev = deviation_from_target(totals)
+            if dev < best["dev"]:
+                best["dev"] = dev
+                best["combo"] = tuple(chosen)
+            return
+        for i in range(first, N - r + 1):
+            # границы для "r продуктов из суффикса i" только сужаются с ростом i,
+            # поэтому при нарушении дальнейшие i можно не рассматривать (break)
+            if price + price_low[i][r] > MAX_BUDGET or price + price_high[i][r] < MIN_BUDGET:
+                break
+            if deviation_lower_bound(i, r, totals) >= best["dev"]:
+                break
+            item_price, item_features = features[i]
+            chosen.append(i)
+            branch(i + 1, r - 1, price + item_price,
+                   tuple(totals[j] + item_features[j] for j in range(m)), chosen)
+            chosen.pop()
+
+    branch(0, K, 0.0, (0.0,)*m, [])
+    elapsed = time.time() - start
+    return best["combo"], best["dev"], best["checked"], elapsed
+
 # ================ Эксперименты: разные операторы =================
 experiments = [
     ("Одноточечный кроссовер + побитовая мутация", cxOnePoint, mutFlipBit),
@@ -280,26 +784,243 @@ experiments = [
 ]
 
 
-results = {}
-start_all = time.time()
-for name, cx_op, mut_op in experiments:
-    print(f"\n=== Запуск эксперимента: {name} ===")
-    res = run_ga(cx_op, mut_op, run_name=name, verbose=True)
-    results[name] = res
+# ================ Параллельный запуск сетки эксперимент x seed =================
+def derive_seed(*spawn_key):
+    """Детерминированный независимый seed для ключа (эксперимент, повтор, ...), выведенный из RANDOM_SEED"""
+    sequence = np.random.SeedSequence(RANDOM_SEED, spawn_key=spawn_key)
+    return int(sequence.generate_state(1)[0])
+
+_metrics_sink = None # приёмник строк (имя, повтор, поколение, макс, среднее) в процессе-исполнителе
+
+def _init_grid_worker(sink):
+    global _metrics_sink
+    _metrics_sink = sink
+
+def _run_grid_task(task):
+    """Задача для процесса-исполнителя: один запуск run_ga со своим потоком случайных чисел"""
+    experiment_index, seed_index, verbose, genome = task
+    name, cx_op, mut_op = experiments[experiment_index]
+    seed = derive_seed(experiment_index, seed_index)
+    random.seed(seed)
+    on_generation = None
+    if _metrics_sink is not None:
+        def on_generation(generation, max_value, mean_value):
+            _metrics_sink((name, seed_index, generation, max_value, mean_value))
+    res = run_ga(cx_op, mut_op, run_name=name, verbose=verbose, genome=genome, on_generation=on_generation)
+    res["seed"] = seed
+    return experiment_index, seed_index, res
+
+def run_experiment_grid(n_seeds=1, processes=None, verbose=False, genome="list", on_result=None,
+                        on_generation=None):
+    """Запускает все experiments x n_seeds на пуле процессов (processes=1 — в текущем процессе).
+    Возвращает {name: [res для seed 0, res для seed 1, ...]}; результат не зависит от числа процессов.
+    on_result(name, seed_index, res) вызывается в основном процессе по мере завершения запусков,
+    on_generation(name, seed_index, generation, max, mean) — по мере завершения поколений
+    (из пула строки приходят через очередь и передаются отдельным потоком)."""
+    tasks = [(e, s, verbose, genome) for e in range(len(experiments)) for s in range(n_seeds)]
+    if processes == 1:
+        _init_grid_worker((lambda row: on_generation(*row)) if on_generation is not None else None)
+        try:
+            grid = _collect_grid(map(_run_grid_task, tasks), n_seeds, on_result)
+        finally:
+            _init_grid_worker(None)
+        return grid
+
+    rows = multiprocessing.Queue() if on_generation is not None else None
+    if rows is not None:
+        def drain():
+            for row in iter(rows.get, None):
+                on_generation(*row)
+        drainer = threading.Thread(target=drain, daemon=True)
+        drainer.start()
+    try:
+        with multiprocessing.Pool(processes, initializer=_init_grid_worker,
+                                  initargs=(rows.put if rows is not None else None,)) as pool:
+            grid = _collect_grid(pool.imap_unordered(_run_grid_task, tasks), n_seeds, on_result)
+            # дождаться выхода исполнителей, чтобы их строки метрик дошли до очереди
+            pool.close()
+            pool.join()
+    finally:
+        if rows is not None:
+            rows.put(None)
+            drainer.join()
+    return grid
+
+def _collect_grid(finished, n_seeds, on_result=None):
+    grid = {name: [None]*n_seeds for name, _, _ in experiments}
+    for experiment_index, seed_index, res in finished:
+        name = experiments[experiment_index][0]
+        grid[name][seed_index] = res
+        if on_result is not None:
+            on_result(name, seed_index, res)
+    return grid
 
-end_all = time.time()
+# ================ Островная модель GA с миграцией =================
+# Каждый остров — своя популяция со своей парой операторов из experiments. Острова эволюционируют
+# параллельно на пуле процессов по ISLAND_MIGRATION_INTERVAL поколений (эпоха), после чего лучшие
+# особи мигрируют к соседям по топологии. Состояние острова (популяция и состояние RNG) передаётся
+# между эпохами целиком, поэтому результат не зависит от числа процессов.
+_island_caches = {} # кэши приспособленности островов в процессе-исполнителе (влияют только на скорость)
 
-# ================ Вывод результатов: графики (макс каждого эксперимента) =================
-plt.figure(figsize=(10, 6))
-for name, data in results.items():
-    plt.plot(data["max_values"], label=f"{name} max")
-    plt.plot(data["mean_values"], label=f"{name} mean", linestyle="--")
-plt.xlabel("Поколение")
-plt.ylabel("Приспособленность")
-plt.title("Сравнение экспериментов: макс и средняя приспособленность")
-plt.legend(loc='best', fontsize='small')
-plt.grid(True)
-plt.show()
+def migration_targets(island_index, n_islands, topology="ring"):
+    """Острова, которым island_index отправляет мигрантов"""
+    if topology == "ring":
+        return [(island_index + 1) % n_islands] if n_islands > 1 else []
+    if topology == "full":
+        return [j for j in range(n_islands) if j != island_index]
+    raise ValueError(f"Неизвестная топология миграции: {topology}")
+
+def _evolve_island(task):
+    """Задача для процесса-исполнителя: generations поколений одного острова"""
+    island_index, experiment_index, population, rng_state, generations, genome = task
+    _, cx_op, mut_op = experiments[experiment_index]
+    backend, operators = resolve_operators(cx_op, mut_op, genome)
+    if island_index not in _island_caches:
+        _island_caches[island_index] = FitnessCache(FITNESS_CACHE_SIZE) if FITNESS_CACHE_SIZE else None
+    cache = _island_caches[island_index]
+
+    random.setstate(rng_state)
+    if population is None:
+        population = backend["population"](POPULATION_SIZE)
+        assign_fitness(population, cache)
+
+    max_values, mean_values = [], []
+    for _ in range(generations):
+        population = next_generation(population, backend, operators, cache)
+        fitnessValues = [ind.fitness.values[0] for ind in population]
+        max_values.append(max(fitnessValues))
+        mean_values.append(sum(fitnessValues) / len(population))
+    return population, random.getstate(), max_values, mean_values
+
+def migrate(populations, migrants=2, topology="ring", genome="list"):
+    """Лучшие migrants особей каждого острова заменяют худших у островов-получателей"""
+    clone_individual = GENOMES[genome]["clone"]
+    fitness_of = lambda ind: ind.fitness.values[0]
+    outgoing = [list(map(clone_individual, sorted(pop, key=fitness_of, reverse=True)[:migrants]))
+                for pop in populations]
+    incoming = [[] for _ in populations]
+    for i in range(len(populations)):
+        for j in migration_targets(i, len(populations), topology):
+            incoming[j].extend(outgoing[i])
+    for pop, arrivals in zip(populations, incoming):
+        if not arrivals:
+            continue
+        arrivals = arrivals[:len(pop)]
+        pop.sort(key=fitness_of)
+        pop[:len(arrivals)] = arrivals
+
+def run_islands(island_experiments=None, generations=MAX_GENERATIONS, interval=10, migrants=2,
+                topology="ring", processes=None, genome="list", seed_index=0, stop_criteria=None):
+    """Островной GA: island_experiments — индексы experiments, по одному острову на индекс
+    (по умолчанию все пары операторов). Возвращает метрики в формате run_ga плюс метрики островов.
+    Критерии остановки проверяются на границах эпох по объединённой популяции островов."""
+    if stop_criteria is None:
+        stop_criteria = default_stop_criteria()
+    start_time = time.time()
+    stop_reason = "max_generations"
+    if island_experiments is None:
+        island_experiments = list(range(len(experiments)))
+    n_islands = len(island_experiments)
+    populations = [None]*n_islands
+    # третий элемент ключа отделяет потоки островов от потоков run_experiment_grid
+    rng_states = [random.Random(derive_seed(i, seed_index, 1)).getstate() for i in range(n_islands)]
+    islands = [{"experiment": experiments[e][0], "max_values": [], "mean_values": []}
+               for e in island_experiments]
+
+    with multiprocessing.Pool(min(processes or os.cpu_count(), n_islands)) as pool:
+        done = 0
+        while done < generations:
+            epoch = min(interval, generations - done)
+            tasks = [(i, island_experiments[i], populations[i], rng_states[i], epoch, genome)
+                     for i in range(n_islands)]
+            for i, (population, rng_state, max_values, mean_values) in enumerate(pool.map(_evolve_island, tasks)):
+                populations[i] = population
+                rng_states[i] = rng_state
+                islands[i]["max_values"].extend(max_values)
+                islands[i]["mean_values"].extend(mean_values)
+            done += epoch
+            reason = check_stop(stop_criteria, {
+                "generation": done,
+                "max_values": [max(values) for values in zip(*(island["max_values"] for island in islands))],
+                "mean_values": [sum(values) / n_islands for values in zip(*(island["mean_values"] for island in islands))],
+                "population": [ind for population in populations for ind in population],
+                "start_time": start_time
+            })
+            if reason is not None:
+                stop_reason = reason
+                break
+            if done < generations:
+                migrate(populations, migrants, topology, genome)
+
+    for island, population in zip(islands, populations):
+        island["population"] = population
+    return {
+        "population": [ind for population in populations for ind in population],
+        "max_values": [max(values) for values in zip(*(island["max_values"] for island in islands))],
+        "mean_values": [sum(values) / n_islands for values in zip(*(island["mean_values"] for island in islands))],
+        "generations": done,
+        "stop_reason": stop_reason,
+        "islands": islands
+    }
+
+# ================ Отчёты: метрики по поколениям и графики =================
+class MetricsWriter():
+    """Потоковая запись max/mean по поколениям: CSV для *.csv, иначе JSON lines.
+    write_row пишет и сбрасывает на диск одну строку (по мере завершения поколений),
+    write_run — все поколения уже завершённого запуска."""
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.csv = csv.writer(self.file) if path.endswith(".csv") else None
+        if self.csv is not None:
+            self.csv.writerow(["run", "seed", "generation", "max", "mean"])
+
+    def _write(self, name, seed_index, generation, max_value, mean_value):
+        if self.csv is not None:
+            self.csv.writerow([name, seed_index, generation, max_value, mean_value])
+        else:
+            self.file.write(json.dumps({"run": name, "seed": seed_index, "generation": generation,
+                                        "max": max_value, "mean": mean_value}, ensure_ascii=False) + "\n")
+
+    def write_row(self, name, seed_index, generation, max_value, mean_value):
+        self._write(name, seed_index, generation, max_value, mean_value)
+        self.file.flush()
+
+    def write_run(self, name, seed_index, res):
+        for generation, (max_value, mean_value) in enumerate(zip(res["max_values"], res["mean_values"]), 1):
+            self._write(name, seed_index, generation, max_value, mean_value)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def plot_results(results, path=None):
+    """Графики макс. и средней приспособленности. Если задан path — сохраняет в файл через
+    неинтерактивный backend Agg, иначе показывает окно. matplotlib импортируется только здесь."""
+    import matplotlib
+    if path is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    for name, data in results.items():
+        plt.plot(data["max_values"], label=f"{name} max")
+        plt.plot(data["mean_values"], label=f"{name} mean", linestyle="--")
+    plt.xlabel("Поколение")
+    plt.ylabel("Приспособленность")
+    plt.title("Сравнение экспериментов: макс и средняя приспособленность")
+    plt.legend(loc='best', fontsize='small')
+    plt.grid(True)
+    if path is not None:
+        plt.savefig(path, dpi=120, bbox_inches="tight")
+        plt.close()
+    else:
+        plt.show()
 
 # ================ Подробный вывод лучшего найденного решения для каждого эксперимента =================
 def print_solution_from_population(pop):
@@ -323,23 +1044,88 @@ def print_solution_from_population(pop):
         "fitness": best.fitness.values[0]
     }
 
-summary = {}
-for name, data in results.items():
-    print(f"\n--- Результат для {name} ---")
-    summary[name] = print_solution_from_population(data["population"])
-
-# ================ Полный перебор для сравнения  =================
-print("\n=== Запуск полного перебора для сравнения ===")
-combo, best_dev, combos_checked, elapsed = exhaustive_search()
-if combo is None:
-    print("Не найдено допустимых комбинаций в бюджетном диапазоне.")
-else:
-    total_price, totals = evaluate_selected(combo)
-    print("Комбинация лучшая (перебор):")
-    for i in combo:
-        print("  -", PRODUCTS[i][0])
-    print("Цена:", total_price)
-    print("Отклонение (сумма квадратов):", best_dev)
-print(f"Комбинаций проверено: {combos_checked}, время: {elapsed:.3f} сек")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="GA для подбора рациона: сравнение операторов скрещивания и мутации")
+    parser.add_argument("--headless", action="store_true",
+                        help="без окон и построчного вывода поколений (для пакетных запусков)")
+    parser.add_argument("--metrics", help="файл метрик по поколениям: *.csv или JSON lines (*.jsonl)")
+    parser.add_argument("--plot", help="сохранить график в файл вместо показа окна")
+    parser.add_argument("--seeds", type=int, default=SEEDS_PER_EXPERIMENT, help="повторов каждого эксперимента")
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="число процессов (1 — последовательно)")
+    parser.add_argument("--genome", choices=sorted(GENOMES), default=GENOME, help="представление генома")
+    parser.add_argument("--islands", action="store_true", default=ISLAND_MODE, help="запустить островную модель")
+    parser.add_argument("--no-exact", action="store_true", help="не запускать полный перебор и метод ветвей и границ")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    verbose = not args.headless
+    writer = MetricsWriter(args.metrics) if args.metrics else None
+
+    start_all = time.time()
+    try:
+        grid = run_experiment_grid(args.seeds, args.processes, verbose=verbose, genome=args.genome,
+                                   on_generation=writer.write_row if writer is not None else None)
+        # results — как и раньше {name: res}, берём первый повтор каждого эксперимента
+        results = {name: runs[0] for name, runs in grid.items()}
+        end_all = time.time()
+        print(f"\nЭкспериментов: {len(experiments)} x {args.seeds} повторов, "
+              f"время: {end_all - start_all:.3f} сек")
+        for name, data in results.items():
+            print(f"{name}: поколений {data['generations']}, остановка: {data['stop_reason']}")
+
+        if args.islands:
+            start_islands = time.time()
+            results["Островная модель"] = run_islands(interval=ISLAND_MIGRATION_INTERVAL, migrants=ISLAND_MIGRANTS,
+                                                      topology=ISLAND_TOPOLOGY, processes=args.processes,
+                                                      genome=args.genome)
+            print(f"Островная модель: {len(experiments)} островов, время: {time.time() - start_islands:.3f} сек")
+            if writer is not None:
+                writer.write_run("Островная модель", 0, results["Островная модель"])
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if args.seeds > 1:
+        print("\n=== Статистика по повторам (лучшая приспособленность) ===")
+        for name, runs in grid.items():
+            best_values = np.array([run["max_values"][-1] for run in runs])
+            print(f"{name}: среднее = {best_values.mean():.8f}, std = {best_values.std():.8f}")
+
+    # ================ Вывод результатов: графики (макс каждого эксперимента) =================
+    if args.plot or not args.headless:
+        plot_results(results, args.plot)
+
+    summary = {}
+    for name, data in results.items():
+        print(f"\n--- Результат для {name} ---")
+        summary[name] = print_solution_from_population(data["population"])
+        if data.get("cache") is not None:
+            print(f"Кэш приспособленности: попаданий {data['cache']['hits']}, "
+                  f"промахов {data['cache']['misses']}, доля попаданий {data['cache']['hit_rate']:.2%}")
+
+    if args.no_exact:
+        return
+
+    # ================ Полный перебор для сравнения  =================
+    print("\n=== Запуск полного перебора для сравнения ===")
+    combo, best_dev, combos_checked, elapsed = exhaustive_search()
+    if combo is None:
+        print("Не найдено допустимых комбинаций в бюджетном диапазоне.")
+    else:
+        total_price, totals = evaluate_selected(combo)
+        print("Комбинация лучшая (перебор):")
+        for i in combo:
+            print("  -", PRODUCTS[i][0])
+        print("Цена:", total_price)
+        print("Отклонение (сумма квадратов):", best_dev)
+    print(f"Комбинаций проверено: {combos_checked}, время: {elapsed:.3f} сек")
 
+    # ================ Метод ветвей и границ (сверка с полным перебором) =================
+    print("\n=== Запуск метода ветвей и границ ===")
+    bb_combo, bb_dev, bb_checked, bb_elapsed = branch_and_bound_search()
+    print("Совпадает с полным перебором:", bb_combo == combo and bb_dev == best_dev)
+    print(f"Комбинаций проверено: {bb_checked}, время: {bb_elapsed:.3f} сек")
 
+if __name__ == "__main__":
+    main()
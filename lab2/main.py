@@ -12,8 +12,25 @@ def trapezoidal_membership(x, a, b, c, d):
     elif c <= x <= d:
         return (d - x) / (d - c)
 
+def trapezoidal_membership_vectorized(x, a, b, c, d):
+    """Векторная трапециевидная функция принадлежности.
+    x — массив значений; a, b, c, d — числа или массивы параметров длины S (S множеств сразу).
+    Для массивов параметров возвращает матрицу формы x.shape + (S,).
+    Вырожденные плечи (a == b или c == d) дают вертикальный фронт без деления на ноль."""
+    x = np.asarray(x, dtype=float)
+    a, b, c, d = (np.asarray(p, dtype=float) for p in (a, b, c, d))
+    if a.ndim > 0:
+        x = x[..., np.newaxis]
+    shape = np.broadcast_shapes(x.shape, a.shape)
+    rise = np.ones(shape)
+    np.divide(x - a, b - a, out=rise, where=np.broadcast_to(b > a, shape))
+    fall = np.ones(shape)
+    np.divide(d - x, d - c, out=fall, where=np.broadcast_to(d > c, shape))
+    mu = np.clip(np.minimum(rise, fall), 0.0, 1.0)
+    return np.where((x < a) | (x > d), 0.0, mu)
+
 def fuzzy_complement(mu_values):
-    return [1 - mu for mu in mu_values]
+    return 1 - np.asarray(mu_values, dtype=float)
 
 def main():
     # диапазон BMI
@@ -26,7 +43,7 @@ def main():
     d = float(input("d = "))
 
     # Значение функции принадлежности ( нечеткое множество )
-    mu_values = [trapezoidal_membership(x, a, b, c, d) for x in x_values]
+    mu_values = trapezoidal_membership_vectorized(x_values, a, b, c, d)
 
     # Дополнение нечеткого множества
     complement_values = fuzzy_complement(mu_values)
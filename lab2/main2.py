@@ -1,6 +1,15 @@
+import itertools
 import numpy as np
 import matplotlib.pyplot as plt
 
+# Реестр нечетких множеств BMI: категория -> параметры трапеции (a, b, c, d)
+BMI_CATEGORIES = {
+    "Недостаточный вес": (10, 11, 17, 18.5),
+    "Нормальный вес": (18.5, 19, 24, 25),
+    "Избыточный вес": (25, 25, 29, 30),
+    "Ожирение": (30, 31, 37, 40)
+}
+
 def trapezoidal_membership(x, a, b, c, d):
     if x < a or x > d:
         return 0.0
@@ -12,27 +21,173 @@ def trapezoidal_membership(x, a, b, c, d):
         return (d - x) / (d - c)
 
 
+def trapezoidal_membership_vectorized(x, a, b, c, d):
+    """Векторная трапециевидная функция принадлежности.
+    x — массив значений; a, b, c, d — числа или массивы параметров длины S (S множеств сразу).
+    Для массивов параметров возвращает матрицу формы x.shape + (S,).
+    Вырожденные плечи (a == b или c == d) дают вертикальный фронт без деления на ноль."""
+    x = np.asarray(x, dtype=float)
+    a, b, c, d = (np.asarray(p, dtype=float) for p in (a, b, c, d))
+    if a.ndim > 0:
+        x = x[..., np.newaxis]
+    shape = np.broadcast_shapes(x.shape, a.shape)
+    rise = np.ones(shape)
+    np.divide(x - a, b - a, out=rise, where=np.broadcast_to(b > a, shape))
+    fall = np.ones(shape)
+    np.divide(d - x, d - c, out=fall, where=np.broadcast_to(d > c, shape))
+    mu = np.clip(np.minimum(rise, fall), 0.0, 1.0)
+    return np.where((x < a) | (x > d), 0.0, mu)
+
+class MembershipLUT:
+    """Функции принадлежности, заранее табулированные на равномерной сетке [lo, hi]:
+    вычисление — индекс в массиве и линейная интерполяция, вне [lo, hi] — значение на краю.
+    Ячейки, в которые попадают точки излома и скачки breakpoints (вырожденное плечо a == b),
+    вычисляются точно через func — внутри остальных ячеек функции гладкие.
+    Сетка удваивается, пока ошибка в серединах ячеек и в точках излома не станет не больше max_error
+    и точные ячейки не займут не больше exact_share сетки; если для этого не хватает max_cells — ValueError."""
+
+    def __init__(self, func, lo, hi, max_error=1e-3, breakpoints=(), max_cells=1 << 20, exact_share=0.01):
+        self.func = func
+        self.lo, self.hi = float(lo), float(hi)
+        breakpoints = np.unique([p for p in np.ravel(breakpoints) if lo <= p <= hi]).astype(float)
+        cells = 64
+        while True:
+            grid = np.linspace(self.lo, self.hi, cells + 1)
+            self.step = (self.hi - self.lo) / cells
+            self.table = func(grid)
+            # значение и наклон в одной строке: одна выборка по индексу на точку
+            slope = np.diff(self.table, axis=0)
+            slope = np.concatenate([slope, np.zeros_like(slope[:1])])
+            self.rows = np.stack([self.table, slope], axis=1)
+            # ячейки с точками излома (точка на узле — обе соседние ячейки)
+            self.exact = np.zeros(cells + 1, dtype=bool)
+            position = (breakpoints - self.lo) / self.step
+            self.exact[np.floor(position).astype(np.intp)] = True
+            self.exact[np.clip(np.ceil(position).astype(np.intp) - 1, 0, cells)] = True
+            check = np.concatenate([(grid[:-1] + grid[1:]) / 2, breakpoints])
+            self.error = float(np.max(np.abs(self(check) - func(check)), initial=0.0))
+            if self.error <= max_error and self.exact.sum() <= max(1, exact_share * cells):
+                break
+            if cells >= max_cells:
+                if self.error > max_error:
+                    raise ValueError(f"MembershipLUT: ошибка {self.error:.3g} > {max_error:.3g} "
+                                     f"при {cells} ячейках (max_cells)")
+                break
+            cells *= 2
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=float)
+        # не конечные значения (NaN, inf) не имеют ячейки — для них значение func, как без таблицы
+        finite = np.isfinite(x)
+        position = np.clip(np.where(finite, x, self.lo), self.lo, self.hi)
+        position -= self.lo
+        position /= self.step
+        index = position.astype(np.intp)
+        fraction = position - index
+        value, slope = np.moveaxis(self.rows[index], np.ndim(index), 0)
+        if self.table.ndim > 1:
+            fraction = fraction[..., np.newaxis]
+        result = value + fraction * slope
+        exact = self.exact[index] & finite
+        if np.any(exact):
+            result[exact] = self.func(np.clip(x, self.lo, self.hi)[exact])
+        if not np.all(finite):
+            result[~finite] = self.func(x[~finite])
+        return result
+
 def fuzzy_complement(mu_values):
     """Операция дополнения нечеткого множества"""
-    return [1 - mu for mu in mu_values]
+    return 1 - np.asarray(mu_values, dtype=float)
+
+class FuzzyBMIClassifier:
+    """Пакетная нечеткая классификация BMI по реестру категорий.
+    Большие массивы и потоки значений обрабатываются блоками по chunk_size — память ограничена размером блока.
+    lut_error включает режим таблицы (MembershipLUT) на отрезке domain с заданной допустимой ошибкой."""
+
+    def __init__(self, categories=BMI_CATEGORIES, chunk_size=1_000_000, lut_error=None, domain=(10, 40)):
+        self.names = list(categories)
+        self.params = np.array([categories[name] for name in self.names], dtype=float).T  # (4, S)
+        self.chunk_size = chunk_size
+        self.lut = None
+        if lut_error is not None:
+            self.lut = MembershipLUT(lambda x: trapezoidal_membership_vectorized(x, *self.params),
+                                     *domain, max_error=lut_error, breakpoints=self.params)
+
+    def _columns(self, names):
+        return [self.names.index(name) for name in names]
+
+    def memberships(self, bmi):
+        """Матрица степеней принадлежности (n x число категорий)"""
+        if self.lut is not None:
+            return self.lut(bmi)
+        return trapezoidal_membership_vectorized(bmi, *self.params)
+
+    def classify(self, bmi):
+        """Степени принадлежности и индекс категории с максимальной степенью.
+        Метка -1 — ни одной категории: все степени нулевые или значение не конечное (NaN — пропуск, inf);
+        count_categories считает такие значения под ключом None."""
+        mu = self.memberships(bmi)
+        missing = ~(np.max(mu, axis=-1) > 0) | ~np.isfinite(np.asarray(bmi, dtype=float))
+        labels = np.where(missing, -1, np.argmax(mu, axis=-1))
+        return mu, labels
+
+    def labels(self, label_indices):
+        """Названия категорий по индексам из classify (None для -1)"""
+        names = np.array(self.names + [None], dtype=object)
+        return names[label_indices]
+
+    def complement(self, mu, names=None):
+        """Дополнение выбранных (по умолчанию всех) категорий"""
+        columns = self._columns(names) if names is not None else slice(None)
+        return fuzzy_complement(mu[..., columns])
+
+    def union(self, mu, names):
+        """Объединение категорий names (максимум степеней)"""
+        return np.max(mu[..., self._columns(names)], axis=-1)
+
+    def intersection(self, mu, names):
+        """Пересечение категорий names (минимум степеней)"""
+        return np.min(mu[..., self._columns(names)], axis=-1)
+
+    def iter_chunks(self, values):
+        """Блоки значений BMI как массивы: из массива — срезами, из итератора — по chunk_size элементов"""
+        if isinstance(values, np.ndarray):
+            for start in range(0, len(values), self.chunk_size):
+                yield values[start:start + self.chunk_size]
+            return
+        iterator = iter(values)
+        while True:
+            chunk = np.fromiter(itertools.islice(iterator, self.chunk_size), dtype=float)
+            if not len(chunk):
+                return
+            yield chunk
+
+    def classify_stream(self, values):
+        """Генератор (bmi, степени принадлежности, индексы категорий) по блокам"""
+        for chunk in self.iter_chunks(values):
+            mu, labels = self.classify(chunk)
+            yield chunk, mu, labels
+
+    def count_categories(self, values):
+        """Число значений в каждой категории (по максимальной степени) без хранения всего набора"""
+        counts = np.zeros(len(self.names) + 1, dtype=np.int64)
+        for _, _, labels in self.classify_stream(values):
+            counts += np.bincount(labels + 1, minlength=len(self.names) + 1)
+        return dict(zip([None] + self.names, counts.tolist()))
 
 def main():
     x_values = np.linspace(10, 40, 400)
 
-    #  параметры для каждой категории
-    categories = {
-        "Недостаточный вес": (10, 11, 17, 18.5),
-        "Нормальный вес": (18.5, 19, 24, 25),
-        "Избыточный вес": (25, 25, 29, 30),
-        "Ожирение": (30, 31, 37, 40)
-    }
+    #  параметры для каждой категории — из реестра
+    categories = BMI_CATEGORIES
+    classifier = FuzzyBMIClassifier(categories)
 
     plt.figure(figsize=(12, 6))
 
-    #  функции принадлежности
-    for label, (a, b, c, d) in categories.items():
-        mu_values = [trapezoidal_membership(x, a, b, c, d) for x in x_values]
-        plt.plot(x_values, mu_values, linewidth=2, label=label)
+    #  функции принадлежности — матрица (len(x_values) x число категорий) одним вызовом
+    memberships = classifier.memberships(x_values)
+    for column, label in enumerate(categories):
+        plt.plot(x_values, memberships[:, column], linewidth=2, label=label)
 
     plt.title("Функции принадлежности для категорий BMI")
     plt.xlabel("BMI (индекс массы тела)")
@@ -42,9 +197,8 @@ def main():
     plt.show()
 
     #  операция дополнения для "нормального веса"
-    a, b, c, d = categories["Нормальный вес"]
-    mu_values = [trapezoidal_membership(x, a, b, c, d) for x in x_values]
-    complement_values = fuzzy_complement(mu_values)
+    mu_values = memberships[:, classifier.names.index("Нормальный вес")]
+    complement_values = classifier.complement(memberships, ["Нормальный вес"])[:, 0]
 
     plt.figure(figsize=(12, 6))
     plt.plot(x_values, mu_values, label='Нормальный вес', color='blue', linewidth=2)
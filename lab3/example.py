@@ -1,55 +1,158 @@
 
 from neo4j import GraphDatabase
+from abc import ABC, abstractmethod
 import random
+import schema
+
+# Хранилище правил: Neo4jDB — в Neo4j, InMemoryRuleStore — в памяти, с одинаковыми методами
+class RuleStore(ABC):
+    rules_version = 0
+
+    @staticmethod
+    def condition_values(sensor_data):
+        """ Показания датчиков, которые могут быть именами условий (строки, без повторов) """
+        return list(dict.fromkeys(value for value in sensor_data.values() if isinstance(value, str)))
+
+    def fetch_applicable_rules(self, sensor_data):
+        """ Извлекает правила, которые соответствуют текущим показаниям датчиков """
+        return self.fetch_applicable_rules_batch([sensor_data])[0]
+
+    @abstractmethod
+    def setup_ontology_and_rules(self, rules, batch_size=5000):
+        pass
+
+    @abstractmethod
+    def fetch_all_rules(self):
+        pass
+
+    def ensure_schema(self, verify_only=False):
+        """ Индексы и ограничения хранилища; возвращает отчет [{name, kind, label, property, status}] """
+        return []
+
+    @abstractmethod
+    def fetch_applicable_rules_batch(self, frames):
+        pass
+
+    def close(self):
+        pass
 
 # Подключение к базе данных Neo4j
-class Neo4jDB:
+class Neo4jDB(RuleStore):
     def __init__(self, uri, user, password):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        # Версия набора правил: увеличивается при каждом изменении правил через этот объект
+        self.rules_version = 0
 
     def close(self):
         self.driver.close()
 
-    def setup_ontology_and_rules(self, rules):
+    # Индексы и ограничения (см. schema.py)
+    SCHEMA = [
+        ("condition_name_unique", "unique", "Condition", "name"),
+        ("action_name_unique", "unique", "Action", "name"),
+        ("rule_name_index", "index", "Rule", "name"),
+    ]
+
+    def ensure_schema(self, verify_only=False):
+        """ Создает (или при verify_only=True только проверяет) SCHEMA, см. schema.ensure_schema """
+        return schema.ensure_schema(self.driver, self.SCHEMA, verify_only)
+
+    def setup_ontology_and_rules(self, rules, batch_size=5000):
         with self.driver.session() as session:
             # Удаление всех существующих данных (для примера)
             session.run("MATCH (n) DETACH DELETE n")
 
-            # Создание онтологии предметной области и добавление правил
-            for rule in rules:
-                condition_name = rule["condition"]
-                action_name = rule["action"]
-
-                # Создание узлов для правил, условий и действий
-                session.run("""
-                MERGE (condition:Condition {name: $condition_name})
-                MERGE (action:Action {name: $action_name})
-                CREATE (rule:Rule {name: $rule_name, max_speed: $max_speed})
-                MERGE (rule)-[:HAS_CONDITION]->(condition)
-                MERGE (rule)-[:REQUIRES_ACTION]->(action)
-                """, condition_name=condition_name, action_name=action_name,
-                     rule_name=rule["name"], max_speed=rule.get("max_speed"))
+        # Ограничения уникальности для MERGE по Condition/Action и индекс правил
+        self.ensure_schema()
 
-    def fetch_applicable_rules(self, sensor_data):
-        """ Извлекает правила, которые соответствуют текущим показаниям датчиков """
         with self.driver.session() as session:
-            applicable_rules = []
-            for key, value in sensor_data.items():
-                query = """
-                MATCH (rule:Rule)-[:HAS_CONDITION]->(condition:Condition {name: $condition_name})
+            # Создание онтологии предметной области и добавление правил:
+            # весь список уходит параметром $rows пачками по batch_size в одной транзакции
+            rows = [{"condition_name": rule["condition"], "action_name": rule["action"],
+                     "rule_name": rule["name"], "max_speed": rule.get("max_speed")} for rule in rules]
+            with session.begin_transaction() as tx:
+                for start in range(0, len(rows), batch_size):
+                    # Создание узлов для правил, условий и действий
+                    tx.run("""
+                    UNWIND $rows AS row
+                    MERGE (condition:Condition {name: row.condition_name})
+                    MERGE (action:Action {name: row.action_name})
+                    CREATE (rule:Rule {name: row.rule_name, max_speed: row.max_speed})
+                    MERGE (rule)-[:HAS_CONDITION]->(condition)
+                    MERGE (rule)-[:REQUIRES_ACTION]->(action)
+                    """, rows=rows[start:start + batch_size])
+                tx.commit()
+        self.rules_version += 1
+
+    def fetch_all_rules(self):
+        """ Весь граф Rule–Condition–Action одним запросом """
+        with self.driver.session() as session:
+            results = session.run("""
+            MATCH (rule:Rule)-[:HAS_CONDITION]->(condition:Condition)
+            MATCH (rule)-[:REQUIRES_ACTION]->(action:Action)
+            WITH DISTINCT rule, condition, action
+            RETURN rule.name AS rule_name, rule.max_speed AS max_speed,
+                   condition.name AS condition, action.name AS action
+            """)
+            return [{
+                "name": record["rule_name"],
+                "condition": record["condition"],
+                "action": record["action"],
+                "max_speed": record["max_speed"]
+            } for record in results]
+
+    def fetch_applicable_rules_batch(self, frames):
+        """ Правила для многих кадров показаний датчиков за один запрос.
+        Возвращает по списку правил на кадр, в порядке показаний кадра и без повторов. """
+        frame_values = [self.condition_values(sensor_data) for sensor_data in frames]
+        values = list(dict.fromkeys(value for frame in frame_values for value in frame))
+        rules_by_condition = {}
+        if values:
+            with self.driver.session() as session:
+                results = session.run("""
+                MATCH (rule:Rule)-[:HAS_CONDITION]->(condition:Condition)
+                WHERE condition.name IN $values
                 MATCH (rule)-[:REQUIRES_ACTION]->(action:Action)
+                WITH DISTINCT rule, condition, action
                 RETURN rule.name AS rule_name, rule.max_speed AS max_speed,
                        condition.name AS condition, action.name AS action
-                """
-                results = session.run(query, condition_name=value)
+                """, values=values)
                 for record in results:
-                    applicable_rules.append({
+                    rules_by_condition.setdefault(record["condition"], []).append({
                         "name": record["rule_name"],
                         "condition": record["condition"],
                         "action": record["action"],
                         "max_speed": record["max_speed"]
                     })
-            return applicable_rules
+        return [[rule for value in frame for rule in rules_by_condition.get(value, [])]
+                for frame in frame_values]
+
+# Хранилище правил в памяти: граф Rule–Condition–Action в словарях с индексом по имени условия
+class InMemoryRuleStore(RuleStore):
+    def __init__(self):
+        self.conditions = {}  # имя условия -> [правила]
+        self.actions = set()
+        self.rules_version = 0
+
+    def setup_ontology_and_rules(self, rules, batch_size=5000):
+        self.conditions = {}
+        self.actions = set()
+        for rule in rules:
+            self.actions.add(rule["action"])
+            self.conditions.setdefault(rule["condition"], []).append({
+                "name": rule["name"],
+                "condition": rule["condition"],
+                "action": rule["action"],
+                "max_speed": rule.get("max_speed")
+            })
+        self.rules_version += 1
+
+    def fetch_all_rules(self):
+        return [dict(rule) for rules in self.conditions.values() for rule in rules]
+
+    def fetch_applicable_rules_batch(self, frames):
+        return [[dict(rule) for value in self.condition_values(sensor_data) for rule in self.conditions.get(value, [])]
+                for sensor_data in frames]
 
 # Создание правил
 rules = [
@@ -272,10 +375,6 @@ rules = [
     {"name": "Регулирование расхода в зависимости от типа культуры", "condition": "Разные культуры", "action": "Регулирование расхода"}
 ]
 
-# Инициализация и настройка базы данных Neo4j
-db = Neo4jDB("bolt://localhost:7687", "neo4j", "gjcnhtkznm")
-db.setup_ontology_and_rules(rules)
-
 # 2. Симуляция данных от датчиков
 def generate_sensor_data():
     sensor_data = {
@@ -290,6 +389,26 @@ def generate_sensor_data():
 class RuleEngine:
     def __init__(self, db):
         self.db = db
+        # Индекс в памяти: имя условия -> правила; перестраивается при смене db.rules_version
+        self.index = None
+        self.index_version = None
+
+    def invalidate(self):
+        """ Сбрасывает индекс правил (например, после правки правил в обход self.db) """
+        self.index = None
+
+    def rule_index(self):
+        if self.index is None or self.index_version != self.db.rules_version:
+            index = {}
+            for rule in self.db.fetch_all_rules():
+                index.setdefault(rule["condition"], []).append(rule)
+            self.index, self.index_version = index, self.db.rules_version
+        return self.index
+
+    def match(self, sensor_data):
+        """ Правила для показаний датчиков — по индексу в памяти, без обращения к базе """
+        index = self.rule_index()
+        return [rule for value in RuleStore.condition_values(sensor_data) for rule in index.get(value, [])]
 
     def execute_action(self, action, rule):
         """ Выполняет действие на основе правила """
@@ -312,7 +431,7 @@ class RuleEngine:
 
     def process_rules(self, sensor_data):
         """ Извлекает правила динамически и выполняет действия при выполнении условий """
-        applicable_rules = self.db.fetch_applicable_rules(sensor_data)
+        applicable_rules = self.match(sensor_data)
         if not applicable_rules:
             print("Нет применимых правил для текущих условий.")
             return
@@ -333,8 +452,13 @@ def run_simulation(db):
         engine.process_rules(sensor_data)
         print('---------------------------')
 
-# Запуск симуляции
-run_simulation(db)
+if __name__ == "__main__":
+    # Инициализация и настройка базы данных Neo4j
+    db = Neo4jDB("bolt://localhost:7687", "neo4j", "gjcnhtkznm")
+    db.setup_ontology_and_rules(rules)
+
+    # Запуск симуляции
+    run_simulation(db)
 
-# Закрытие соединения с базой данных
-db.close()
\ No newline at end of file
+    # Закрытие соединения с базой данных
+    db.close()
@@ -1,11 +1,328 @@
 from neo4j import GraphDatabase
 import random
 import time
+import math
+import queue
+import threading
+import asyncio
 import numpy as np
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import schema
+
+
+# --- Табулированные функции принадлежности (LUT) ---
+class MembershipLUT:
+    """Термы одной лингвистической переменной, табулированные на равномерной сетке [lo, hi].
+    Вычисление — индекс ячейки и линейная интерполяция (вне [lo, hi] — значение на краю,
+    для NaN и inf — степени 0, как у triangular_mf).
+    Число ячеек удваивается, пока ошибка в серединах ячеек и точках излома термов не станет
+    не больше max_error."""
+
+    def __init__(self, terms, mf, lo, hi, max_error=1e-3, cells=100, max_cells=1 << 20):
+        self.names = list(terms)
+        self.terms = dict(terms)
+        self.lo, self.hi = float(lo), float(hi)
+        breakpoints = [p for params in terms.values() for p in params if lo <= p <= hi]
+
+        def exact(x):
+            return [mf(x, *terms[name]) for name in self.names]
+
+        while True:
+            self.cells = cells
+            self.step = (self.hi - self.lo) / cells
+            self.table = [exact(self.lo + i * self.step) for i in range(cells + 1)]
+            # наклоны по ячейкам; последняя строка нулевая — для x == hi
+            self.slopes = [[b - a for a, b in zip(left, right)]
+                           for left, right in zip(self.table, self.table[1:])] + [[0.0] * len(self.names)]
+            check = [self.lo + (i + 0.5) * self.step for i in range(cells)] + breakpoints
+            self.error = max(abs(value - reference)
+                             for x in check for value, reference in zip(self.values(x), exact(x)))
+            if self.error <= max_error:
+                break
+            if cells >= max_cells:
+                raise ValueError(f"MembershipLUT: ошибка {self.error:.3g} > {max_error:.3g} "
+                                 f"при {cells} ячейках (max_cells)")
+            cells *= 2
+        self.table_array = np.array(self.table)
+        self.slopes_array = np.array(self.slopes)
+
+    def values(self, x):
+        """Степени принадлежности термам (в порядке names) для одного значения"""
+        if not math.isfinite(x):
+            return [0.0] * len(self.names)
+        position = (min(max(x, self.lo), self.hi) - self.lo) / self.step
+        i = int(position)
+        fraction = position - i
+        return [value + fraction * slope for value, slope in zip(self.table[i], self.slopes[i])]
+
+    def __call__(self, x):
+        return dict(zip(self.names, self.values(x)))
+
+    def evaluate(self, x):
+        """Матрица степеней принадлежности (n x число термов) для массива значений"""
+        x = np.asarray(x, dtype=float)
+        finite = np.isfinite(x)
+        position = (np.clip(np.where(finite, x, self.lo), self.lo, self.hi) - self.lo) / self.step
+        index = position.astype(np.intp)
+        fraction = (position - index)[..., np.newaxis]
+        mu = self.table_array[index] + fraction * self.slopes_array[index]
+        mu[~finite] = 0.0
+        return mu
+
+
+# --- Компилируемая база нечетких правил (Мамдани / Сугено) ---
+def triangular_mf_array(x, a, b, c):
+    """Векторный аналог FuzzyLogic.triangular_mf (с тем же поведением при a == b или b == c)"""
+    x, a, b, c = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x, a, b, c)))
+    valid = (b != a) & (c != b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.minimum((x - a) / (b - a), (c - x) / (c - b))
+    return np.where(valid, np.maximum(mu, 0.0), 0.0)
+
+
+class FuzzyRuleBase:
+    """База нечетких правил, заданная данными и скомпилированная в массивы индексов.
+
+    inputs  — {переменная: {терм: (a, b, c)}} (треугольные термы);
+    output  — (имя, (lo, hi), {терм: (a, b, c)}) выходной переменной;
+    rules   — [{"name": ..., "if": {переменная: терм}, "then": терм, "op": "and" | "or",
+                "value": константа для Сугено (по умолчанию — вершина выходного терма)}].
+    Все методы работают с пакетом входных векторов: массив (n x число входов) в порядке inputs
+    или словарь {переменная: массив}.
+    """
+
+    METHODS = ('centroid', 'bisector', 'mom', 'sugeno')
+
+    def __init__(self, inputs, output, rules, grid_points=100, default=50, chunk_size=65536):
+        self.variables = list(inputs)
+        self.inputs = inputs
+        self.output_name, (lo, hi), output_terms = output
+        self.default = default
+        self.chunk_size = chunk_size
+        self.rule_names = [rule.get("name", f"rule{i}") for i, rule in enumerate(rules)]
+
+        # входные термы: номер переменной и параметры каждого терма
+        self.terms = [(variable, term) for variable in self.variables for term in inputs[variable]]
+        term_index = {key: i for i, key in enumerate(self.terms)}
+        self.term_variable = np.array([self.variables.index(variable) for variable, _ in self.terms])
+        self.term_params = np.array([inputs[variable][term] for variable, term in self.terms], dtype=float)
+
+        # правила: индексы термов-антецедентов, дополненные фиктивным термом (1 для И, 0 для ИЛИ)
+        width = max(len(rule["if"]) for rule in rules)
+        self.is_or = np.array([rule.get("op", "and") == "or" for rule in rules])
+        pad = np.where(self.is_or, len(self.terms) + 1, len(self.terms))
+        self.rule_terms = np.array([
+            [term_index[(variable, term)] for variable, term in rule["if"].items()] + [pad[i]] * (width - len(rule["if"]))
+            for i, rule in enumerate(rules)
+        ])
+
+        # выход: значения термов на сетке и номер выходного терма каждого правила
+        self.output_terms = list(output_terms)
+        self.grid = np.linspace(lo, hi, grid_points)
+        self.output_sets = np.array([triangular_mf_array(self.grid, *output_terms[term]) for term in self.output_terms])
+        self.rule_output = np.array([self.output_terms.index(rule["then"]) for rule in rules])
+        self.rule_values = np.array([rule.get("value", output_terms[rule["then"]][1]) for rule in rules], dtype=float)
+
+    @classmethod
+    def from_records(cls, inputs, output, records, **kwargs):
+        """Правила из записей базы знаний: {"name", "variables": [...], "terms": [...], "then", "op"}"""
+        rules = [{"name": record["name"], "if": dict(zip(record["variables"], record["terms"])),
+                  "then": record["then"], "op": record.get("op") or "and"} for record in records]
+        return cls(inputs, output, rules, **kwargs)
+
+    def _matrix(self, x):
+        if isinstance(x, dict):
+            return np.column_stack([np.atleast_1d(np.asarray(x[variable], dtype=float)) for variable in self.variables])
+        return np.atleast_2d(np.asarray(x, dtype=float))
+
+    def memberships(self, x):
+        """Степени принадлежности всем входным термам (n x число термов).
+        Если включены таблицы FuzzyLogic.luts с теми же термами — по таблицам (MembershipLUT.evaluate)."""
+        x = self._matrix(x)
+        luts = FuzzyLogic.luts
+        if luts is not None and all(variable in luts and luts[variable].terms == self.inputs[variable]
+                                    for variable in self.variables):
+            mu = np.empty((len(x), len(self.terms)))
+            for j, variable in enumerate(self.variables):
+                lut = luts[variable]
+                columns = [i for i, (v, _) in enumerate(self.terms) if v == variable]
+                mu[:, columns] = lut.evaluate(x[:, j])[:, [lut.names.index(self.terms[i][1]) for i in columns]]
+            return mu
+        return triangular_mf_array(x[:, self.term_variable], *self.term_params.T)
+
+    def firing_strengths(self, x):
+        """Силы срабатывания правил (n x число правил): min для И, max для ИЛИ"""
+        mu = self.memberships(x)
+        n = len(mu)
+        mu = np.concatenate([mu, np.ones((n, 1)), np.zeros((n, 1))], axis=1)
+        antecedents = mu[:, self.rule_terms]
+        return np.where(self.is_or, antecedents.max(axis=2), antecedents.min(axis=2))
+
+    def aggregate(self, strengths):
+        """Агрегированное выходное множество на сетке (n x len(grid)): max по правилам от срезанных термов"""
+        strengths = np.atleast_2d(strengths)
+        y = np.zeros((len(strengths), len(self.grid)))
+        for term in range(len(self.output_terms)):
+            rules = self.rule_output == term
+            if rules.any():
+                activation = strengths[:, rules].max(axis=1)
+                np.maximum(y, np.minimum(activation[:, np.newaxis], self.output_sets[term]), out=y)
+        return y
+
+    def defuzzify(self, y, method='centroid'):
+        """Дефаззификация агрегированных множеств: centroid, bisector или mom (среднее максимумов)"""
+        total = y.sum(axis=1)
+        empty = total == 0
+        safe_total = np.where(empty, 1.0, total)
+        if method == 'centroid':
+            result = y @ self.grid / safe_total
+        elif method == 'bisector':
+            cumulative = np.cumsum(y, axis=1)
+            result = self.grid[np.argmax(cumulative >= cumulative[:, -1:] / 2, axis=1)]
+        elif method == 'mom':
+            maxima = y >= y.max(axis=1, keepdims=True)
+            result = maxima @ self.grid / maxima.sum(axis=1)
+        else:
+            raise ValueError(f"Неизвестный метод дефаззификации: {method}")
+        return np.where(empty, self.default, result)
+
+    def infer(self, x, method='centroid'):
+        """Нечеткий вывод для пакета входов; method — centroid, bisector, mom или sugeno"""
+        if method not in self.METHODS:
+            raise ValueError(f"Неизвестный метод дефаззификации: {method}")
+        x = self._matrix(x)
+        result = np.empty(len(x))
+        for start in range(0, len(x), self.chunk_size):
+            strengths = self.firing_strengths(x[start:start + self.chunk_size])
+            if method == 'sugeno':
+                total = strengths.sum(axis=1)
+                chunk = np.where(total == 0, self.default,
+                                 strengths @ self.rule_values / np.where(total == 0, 1.0, total))
+            else:
+                chunk = self.defuzzify(self.aggregate(strengths), method)
+            result[start:start + len(chunk)] = chunk
+        return result
+
+
+class QuantizedCache:
+    """Ограниченный LRU-кэш результатов по квантованным входам.
+    resolution — шаг квантования по каждому входу (0.1 °C, 1 % ...): близкие показания датчиков
+    попадают в одну ячейку, а результат вычисляется в узле сетки, поэтому не зависит от порядка запросов."""
+
+    def __init__(self, resolution, maxsize=4096):
+        self.resolution = tuple(resolution)
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, values):
+        """Индексы ячеек сетки для значений входов"""
+        return tuple(int(round(value / step)) for value, step in zip(values, self.resolution))
+
+    def get(self, values, compute, tag=None):
+        """Результат compute(*узлы сетки) из кэша или с вычислением и вытеснением самой старой записи"""
+        key = (tag,) + self.quantize(values)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        result = compute(*(index * step for index, step in zip(key[1:], self.resolution)))
+        self.entries[key] = result
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self.entries), "hit_rate": self.hits / total if total else 0.0}
 
 
 # --- Модуль нечеткой логики ---
 class FuzzyLogic:
+    # Лингвистические переменные: терм -> параметры треугольной функции (a, b, c) на отрезке 0..100
+    VARIABLES = {
+        'temperature': {'cold': (0, 20, 40), 'warm': (30, 50, 70), 'hot': (60, 80, 100)},
+        'progress': {'start': (0, 0, 30), 'middle': (20, 50, 80), 'end': (70, 100, 100)},
+        'amount': {'low': (0, 0, 50), 'medium': (30, 60, 90), 'high': (70, 100, 100)},
+    }
+    DOMAIN = (0, 100)
+
+    # Таблицы MembershipLUT по переменным; None — точное вычисление функций принадлежности
+    luts = None
+
+    @staticmethod
+    def compile_luts(max_error=1e-3):
+        """Включает режим таблиц: каждая переменная один раз табулируется на плотной сетке"""
+        FuzzyLogic.luts = {
+            variable: MembershipLUT(terms, FuzzyLogic.triangular_mf, *FuzzyLogic.DOMAIN, max_error=max_error)
+            for variable, terms in FuzzyLogic.VARIABLES.items()
+        }
+        FuzzyLogic._clear_caches()
+        return FuzzyLogic.luts
+
+    @staticmethod
+    def disable_luts():
+        FuzzyLogic.luts = None
+        FuzzyLogic._clear_caches()
+
+    # Шаг квантования показаний датчиков для мемоизации
+    RESOLUTION = {'temperature': 0.1, 'progress': 1, 'amount': 1}
+
+    # Кэши QuantizedCache: переменная -> кэш фаззификации, 'inference' -> кэш вывода; None — без кэша
+    caches = None
+
+    @staticmethod
+    def enable_cache(resolution=None, maxsize=4096):
+        """Включает мемоизацию фаззификации и полного вывода по квантованным входам"""
+        resolution = dict(FuzzyLogic.RESOLUTION, **(resolution or {}))
+        FuzzyLogic.caches = {variable: QuantizedCache((resolution[variable],), maxsize)
+                             for variable in FuzzyLogic.VARIABLES}
+        FuzzyLogic.caches['inference'] = QuantizedCache(
+            (resolution['temperature'], resolution['progress']), maxsize)
+        return FuzzyLogic.caches
+
+    @staticmethod
+    def disable_cache():
+        FuzzyLogic.caches = None
+
+    @staticmethod
+    def _clear_caches():
+        # Результаты в кэше зависят от режима вычисления (таблицы или точно)
+        if FuzzyLogic.caches is not None:
+            for cache in FuzzyLogic.caches.values():
+                cache.clear()
+
+    @staticmethod
+    def cache_stats():
+        """Статистика попаданий/промахов/вытеснений по каждому кэшу"""
+        if FuzzyLogic.caches is None:
+            return {}
+        return {name: cache.stats() for name, cache in FuzzyLogic.caches.items()}
+
+    @staticmethod
+    def fuzzify(variable, value):
+        """Степени принадлежности значения термам переменной (по таблице, если она включена)"""
+        if FuzzyLogic.caches is not None:
+            return dict(FuzzyLogic.caches[variable].get((value,), lambda v: FuzzyLogic._fuzzify(variable, v)))
+        return FuzzyLogic._fuzzify(variable, value)
+
+    @staticmethod
+    def _fuzzify(variable, value):
+        if FuzzyLogic.luts is not None:
+            return FuzzyLogic.luts[variable](value)
+        return {term: FuzzyLogic.triangular_mf(value, *params)
+                for term, params in FuzzyLogic.VARIABLES[variable].items()}
+
     @staticmethod
     def triangular_mf(x, a, b, c):
         """Треугольная функция принадлежности"""
@@ -19,80 +336,379 @@ class FuzzyLogic:
     @staticmethod
     def fuzzify_temperature(temp):
         """Фаззификация температуры"""
-        cold = FuzzyLogic.triangular_mf(temp, 0, 20, 40)
-        warm = FuzzyLogic.triangular_mf(temp, 30, 50, 70)
-        hot = FuzzyLogic.triangular_mf(temp, 60, 80, 100)
-        return {'cold': cold, 'warm': warm, 'hot': hot}
+        return FuzzyLogic.fuzzify('temperature', temp)
 
     @staticmethod
     def fuzzify_cooking_progress(progress):
         """Фаззификация прогресса готовки"""
-        start = FuzzyLogic.triangular_mf(progress, 0, 0, 30)
-        middle = FuzzyLogic.triangular_mf(progress, 20, 50, 80)
-        end = FuzzyLogic.triangular_mf(progress, 70, 100, 100)
-        return {'start': start, 'middle': middle, 'end': end}
+        return FuzzyLogic.fuzzify('progress', progress)
 
     @staticmethod
     def fuzzify_ingredient_amount(amount):
         """Фаззификация количества ингредиентов"""
-        low = FuzzyLogic.triangular_mf(amount, 0, 0, 50)
-        medium = FuzzyLogic.triangular_mf(amount, 30, 60, 90)
-        high = FuzzyLogic.triangular_mf(amount, 70, 100, 100)
-        return {'low': low, 'medium': medium, 'high': high}
+        return FuzzyLogic.fuzzify('amount', amount)
+
+    # Выходная переменная "мощность нагрева" и правила вывода — данными для FuzzyRuleBase
+    POWER_OUTPUT = ('power', (0, 100), {'high': (70, 85, 100), 'medium': (40, 60, 80), 'low': (0, 15, 30)})
+    RULES = [
+        {"name": "cold_high", "if": {"temperature": "cold", "progress": "start"}, "then": "high"},  # холодно И начало -> высокая
+        {"name": "warm_medium", "if": {"temperature": "warm", "progress": "middle"}, "then": "medium"},  # тепло И середина -> средняя
+        {"name": "hot_low", "if": {"temperature": "hot", "progress": "end"}, "then": "low"},  # горячо И конец -> низкая
+    ]
+
+    # Скомпилированная база правил (строится при первом обращении)
+    rule_base = None
+
+    @staticmethod
+    def engine(rules=None):
+        """База правил мощности нагрева; rules — другой набор правил (например, из Neo4j)"""
+        if rules is not None:
+            return FuzzyRuleBase(FuzzyLogic.input_variables(), FuzzyLogic.POWER_OUTPUT, rules)
+        if FuzzyLogic.rule_base is None:
+            FuzzyLogic.rule_base = FuzzyRuleBase(FuzzyLogic.input_variables(), FuzzyLogic.POWER_OUTPUT, FuzzyLogic.RULES)
+        return FuzzyLogic.rule_base
+
+    @staticmethod
+    def infer_heat_power(temperatures, progresses, method='centroid'):
+        """Мощность нагрева для N приборов сразу: массивы температур и прогрессов -> массив мощностей"""
+        return FuzzyLogic.engine().infer({'temperature': temperatures, 'progress': progresses}, method)
+
+    @staticmethod
+    def infer_power(rule_base, temperature, progress):
+        """Мощность нагрева для одного состояния; при включенном кэше — по квантованным входам"""
+        def compute(t, p):
+            return float(rule_base.infer({'temperature': t, 'progress': p})[0])
+        if FuzzyLogic.caches is not None:
+            return FuzzyLogic.caches['inference'].get((temperature, progress), compute, tag=rule_base)
+        return compute(temperature, progress)
+
+    @staticmethod
+    def input_variables():
+        return {variable: FuzzyLogic.VARIABLES[variable] for variable in ('temperature', 'progress')}
 
     @staticmethod
     def defuzzify_heat_power(rules_output):
-        """Дефаззификация мощности нагрева (центроидный метод)"""
-        # Определяем выходные функции для мощности нагрева
-        x = np.linspace(0, 100, 100)
-        y = np.zeros_like(x, dtype=float)
+        """Дефаззификация мощности нагрева (центроидный метод).
+        rules_output — {имя правила: ..., терм: степень}: правило из rules_output срабатывает
+        с силой min степеней своих термов-антецедентов."""
+        engine = FuzzyLogic.engine()
+        strengths = np.array([[
+            min(rules_output.get(term, 0) for term in rule["if"].values()) if rule["name"] in rules_output else 0
+            for rule in FuzzyLogic.RULES
+        ]])
+        return engine.defuzzify(engine.aggregate(strengths))[0]
+
+
+def batches(items, size):
+    """Разбивает список на части не длиннее size"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class LogBuffer:
+    """Отложенная запись (write-behind) логов и состояний приборов.
+    События копятся в очереди и пишутся фоновым потоком через UNWIND каждые max_events событий
+    или flush_interval_ms миллисекунд. Если очередь заполнена (capacity), add ждет — это обратное давление."""
+
+    QUERIES = {
+        "log": """
+        UNWIND $rows AS row
+        CREATE (л:Лог {
+            рецепт: row.recipe,
+            время: row.time,
+            действие: row.action,
+            сообщение: row.message,
+            нечеткая_мощность: row.fuzzy_power,
+            температура: row.temperature,
+            timestamp: row.timestamp
+        })
+        """,
+        "completion": """
+        UNWIND $rows AS row
+        CREATE (з:Завершение {
+            рецепт: row.recipe,
+            общее_время: row.total_time,
+            статус: 'успешно',
+            timestamp: row.timestamp
+        })
+        """,
+        "appliance": """
+        UNWIND $rows AS row
+        MATCH (a:КухонныйПрибор {name: row.name})
+        SET a.состояние = row.state,
+            a.мощность = coalesce(row.power, a.мощность),
+            a.температура = coalesce(row.temperature, a.температура)
+        """,
+    }
+    STOP = object()
+
+    def __init__(self, db, max_events=100, flush_interval_ms=200, capacity=10000):
+        self.db = db
+        self.max_events = max_events
+        self.flush_interval = flush_interval_ms / 1000
+        self.queue = queue.Queue(maxsize=capacity)
+        self.flushes = 0
+        self.written = 0
+        self.thread = threading.Thread(target=self._worker, name="neo4j-log-buffer", daemon=True)
+        self.thread.start()
+
+    def add(self, kind, row):
+        """Ставит событие в очередь; метка времени — момент события, а не записи
+        (переданная вызывающим timestamp сохраняется, иначе — момент постановки)"""
+        row = dict(row)
+        row.setdefault("timestamp", int(time.time() * 1000))
+        self.queue.put((kind, row))
+
+    def flush(self):
+        """Ждет, пока все поставленные события будут записаны"""
+        self.queue.join()
+
+    def close(self):
+        """Дописывает оставшиеся события и останавливает поток"""
+        if self.thread.is_alive():
+            self.queue.put((self.STOP, None))
+            self.thread.join()
+
+    def _worker(self):
+        pending = []
+        stop = False
+        while not stop:
+            deadline = time.monotonic() + self.flush_interval
+            while len(pending) < self.max_events:
+                try:
+                    event = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event[0] is self.STOP:
+                    self.queue.task_done()
+                    stop = True
+                    break
+                pending.append(event)
+            if pending:
+                self._write(pending)
+                for _ in pending:
+                    self.queue.task_done()
+                pending = []
+
+    def _write(self, events):
+        rows = {}
+        for kind, row in events:
+            rows.setdefault(kind, []).append(row)
+        try:
+            self.db.write_batches([(self.QUERIES[kind], kind_rows) for kind, kind_rows in rows.items()],
+                                  self.max_events)
+            self.flushes += 1
+            self.written += len(events)
+        except Exception as e:
+            print(f"⚠️ Ошибка логирования: {e}")
 
-        # Применяем правила (макс-мин композиция)
-        for i, xi in enumerate(x):
-            member_values = []
 
-            # Правило 1: Если холодно И начало -> высокая мощность
-            if 'cold_high' in rules_output:
-                cold_high = min(rules_output.get('cold', 0), rules_output.get('start', 0))
-                member_val = FuzzyLogic.triangular_mf(xi, 70, 85, 100)  # Высокая мощность
-                member_values.append(min(cold_high, member_val))
+class KitchenStore(ABC):
+    """Интерфейс хранилища онтологии кухни: Neo4jDB — в Neo4j, InMemoryKitchenStore — в памяти.
+    Симулятор работает только через эти методы, поэтому хранилища взаимозаменяемы."""
+
+    # Экземпляры онтологии кухни (загружаются load_ontology)
+    RECIPES = [
+        {"name": "Суп", "time": 20, "ingredients": ["Вода", "Овощи", "Картофель", "Специи"]},
+        {"name": "Макароны", "time": 12, "ingredients": []},
+        {"name": "Омлет", "time": 10, "ingredients": []},
+        {"name": "Рис", "time": 18, "ingredients": []},
+    ]
+    INGREDIENTS = [
+        {"name": "Вода", "amount": "1.5л"},
+        {"name": "Овощи", "amount": "300г"},
+        {"name": "Картофель", "amount": "200г"},
+        {"name": "Специи", "amount": "по вкусу"},
+        {"name": "Макароны", "amount": "200г"},
+        {"name": "Яйца", "amount": "3шт"},
+        {"name": "Рис", "amount": "150г"},
+    ]
+    APPLIANCES = [
+        {"name": "Плита", "state": "выключена", "power": 0},
+        {"name": "Сковорода", "state": "не используется", "temperature": 0},
+        {"name": "Кастрюля", "state": "не используется", "temperature": 0},
+    ]
+
+    # Правила приготовления по рецептам (add_cooking_rules) — они же локальный резервный рецепт
+    COOKING_RULES = {
+        # Правила для супа с нечеткой логикой
+        "Суп": [
+            {"time": 1, "condition": "Начать приготовление", "action": "Включить плиту",
+             "message": "🔥 Плита включена, вода начинает нагреваться", "fuzzy_power": 80},
+            {"time": 3, "condition": "Вода нагрета", "action": "Добавить овощи",
+             "message": "🥕 Овощи добавлены в суп", "fuzzy_power": 70},
+            {"time": 5, "condition": "Овощи готовятся", "action": "Добавить картофель",
+             "message": "🥔 Картофель добавлен в суп", "fuzzy_power": 65},
+            {"time": 8, "condition": "Картофель готовится", "action": "Добавить специи",
+             "message": "🧂 Специи добавлены", "fuzzy_power": 60},
+            {"time": 12, "condition": "Ингредиенты готовы", "action": "Перемешать",
+             "message": "🥄 Суп перемешан", "fuzzy_power": 55},
+            {"time": 15, "condition": "Суп кипит", "action": "Убавить огонь",
+             "message": "♨️ Огонь уменьшен для томления", "fuzzy_power": 40},
+            {"time": 18, "condition": "Суп готовится", "action": "Проверить густоту",
+             "message": "💧 Проверка густоты супа", "fuzzy_power": 35},
+            {"time": 20, "condition": "Приготовление завершено", "action": "Выключить плиту",
+             "message": "✅ Суп готов! Подавать к столу", "fuzzy_power": 0}
+        ]
+    }
+
+    log_buffer = None
 
-            # Правило 2: Если тепло И середина -> средняя мощность
-            if 'warm_medium' in rules_output:
-                warm_medium = min(rules_output.get('warm', 0), rules_output.get('middle', 0))
-                member_val = FuzzyLogic.triangular_mf(xi, 40, 60, 80)  # Средняя мощность
-                member_values.append(min(warm_medium, member_val))
+    @staticmethod
+    def _get_local_recipe_steps(recipe_name):
+        """Локальные рецепты (резервный вариант)"""
+        return [dict(step) for step in KitchenStore.COOKING_RULES.get(recipe_name, [])]
+
+    @staticmethod
+    def step_from_record(record):
+        """Шаг рецепта из записи правила (нулевая/пустая мощность -> 50, как в базе знаний)"""
+        return {
+            "time": record["time"],
+            "condition": record["condition"],
+            "action": record["action"],
+            "message": record["message"],
+            "fuzzy_power": record["fuzzy_power"] if record["fuzzy_power"] else 50
+        }
+
+    @staticmethod
+    def fuzzy_rule_records(rules=None):
+        """Правила нечеткого вывода в виде записей {name, variables, terms, then, op}"""
+        return [{"name": rule["name"], "variables": list(rule["if"]), "terms": list(rule["if"].values()),
+                 "then": rule["then"], "op": rule.get("op", "and")} for rule in (rules or FuzzyLogic.RULES)]
+
+    @abstractmethod
+    def setup_kitchen_ontology(self):
+        pass
+
+    @abstractmethod
+    def load_ontology(self, recipes=(), ingredients=(), appliances=(), batch_size=None):
+        pass
 
-            # Правило 3: Если горячо И конец -> низкая мощность
-            if 'hot_low' in rules_output:
-                hot_low = min(rules_output.get('hot', 0), rules_output.get('end', 0))
-                member_val = FuzzyLogic.triangular_mf(xi, 0, 15, 30)  # Низкая мощность
-                member_values.append(min(hot_low, member_val))
+    @abstractmethod
+    def add_cooking_rules(self, recipe_rules=None, batch_size=None):
+        pass
 
-            if member_values:
-                y[i] = max(member_values)
+    @abstractmethod
+    def get_recipe_steps(self, recipe_name):
+        pass
+
+    @abstractmethod
+    def get_recipe_ingredients(self, recipe_name):
+        """[(ингредиент, количество)] рецепта"""
+
+    @abstractmethod
+    def get_fuzzy_rules(self):
+        pass
+
+    @abstractmethod
+    def update_appliance_state(self, appliance_name, state, power=None, temperature=None):
+        pass
 
-        # Центроидный метод дефаззификации
-        if np.sum(y) == 0:
-            return 50  # Значение по умолчанию
+    @abstractmethod
+    def log_events(self, kind, rows):
+        pass
 
-        return np.sum(x * y) / np.sum(y)
+    @abstractmethod
+    def get_cooking_history(self, recipe_name):
+        """Логи шагов рецепта по времени: [{time, action, message, power, temperature}]"""
+
+    def ensure_schema(self, verify_only=False):
+        """Индексы и ограничения хранилища; возвращает отчет [{name, kind, label, property, status}]"""
+        return []
+
+    def flush_logs(self):
+        pass
+
+    def close(self):
+        pass
 
 
 # --- Подключение к Neo4j ---
-class Neo4jDB:
+class Neo4jDB(KitchenStore):
+    # Сколько строк отправляется одним параметром $rows в UNWIND-запросе
+    BATCH_SIZE = 5000
+
     def __init__(self, uri, user, password):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.log_buffer = None
+
+    def write_batches(self, writes, batch_size=None):
+        """Массовая запись в одной явной транзакции.
+        writes — список пар (запрос с UNWIND $rows, список строк); строки уходят пачками по batch_size."""
+        batch_size = batch_size or self.BATCH_SIZE
+        with self.driver.session() as session:
+            with session.begin_transaction() as tx:
+                for query, rows in writes:
+                    for chunk in batches(rows, batch_size):
+                        tx.run(query, rows=chunk)
+                tx.commit()
+
+    def load_ontology(self, recipes=(), ingredients=(), appliances=(), batch_size=None):
+        """Массовая загрузка экземпляров онтологии (MERGE по name: повторная загрузка обновляет узлы).
+        recipes — [{"name", "time", "ingredients": [имена]}], ingredients — [{"name", "amount"}],
+        appliances — [{"name", "state", "power"/"temperature"}]."""
+        self.write_batches([
+            ("""
+            UNWIND $rows AS row
+            MERGE (ингредиент:Ингредиент {name: row.name})
+            SET ингредиент.количество = row.amount
+            """, ingredients),
+            ("""
+            UNWIND $rows AS row
+            MERGE (прибор:КухонныйПрибор {name: row.name})
+            SET прибор.состояние = row.state, прибор.мощность = row.power, прибор.температура = row.temperature
+            """, appliances),
+            ("""
+            UNWIND $rows AS row
+            MERGE (рецепт:Рецепт {name: row.name})
+            SET рецепт.время_приготовления = row.time
+            WITH рецепт, row
+            UNWIND row.ingredients AS ingredient_name
+            MATCH (ингредиент:Ингредиент {name: ingredient_name})
+            MERGE (рецепт)-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(ингредиент)
+            """, recipes),
+        ], batch_size)
 
     def close(self):
+        if self.log_buffer is not None:
+            self.log_buffer.close()
+            self.log_buffer = None
         self.driver.close()
 
+    def start_log_buffer(self, max_events=100, flush_interval_ms=200, capacity=10000):
+        """Включает отложенную запись логов и состояний приборов (LogBuffer)"""
+        if self.log_buffer is None:
+            self.log_buffer = LogBuffer(self, max_events, flush_interval_ms, capacity)
+        return self.log_buffer
+
+    def flush_logs(self):
+        if self.log_buffer is not None:
+            self.log_buffer.flush()
+
+    # Индексы и ограничения (см. schema.py)
+    SCHEMA = [
+        ("recipe_name_unique", "unique", "Рецепт", "name"),
+        ("ingredient_name_unique", "unique", "Ингредиент", "name"),
+        ("appliance_name_unique", "unique", "КухонныйПрибор", "name"),
+        ("log_recipe_index", "index", "Лог", "рецепт"),
+        ("completion_recipe_index", "index", "Завершение", "рецепт"),
+    ]
+
+    def ensure_schema(self, verify_only=False):
+        """Создает (или при verify_only=True только проверяет) SCHEMA, см. schema.ensure_schema"""
+        return schema.ensure_schema(self.driver, self.SCHEMA, verify_only)
+
     def setup_kitchen_ontology(self):
 
         with self.driver.session() as session:
             # Очистка базы
             session.run("MATCH (n) DETACH DELETE n")
 
+        # Индексы и ограничения уникальности для поиска по name / рецепт
+        self.ensure_schema()
+
+        with self.driver.session() as session:
             # Создание основных классов онтологии
             session.run("""
             CREATE (:Class {name: 'Рецепт'})
@@ -103,39 +719,6 @@ class Neo4jDB:
             CREATE (:Class {name: 'НечеткоеПравило'})
             """)
 
-            # Создание конкретных экземпляров
-            session.run("""
-            CREATE (суп:Рецепт {name: 'Суп', время_приготовления: 20})
-            CREATE (макароны:Рецепт {name: 'Макароны', время_приготовления: 12})
-            CREATE (омлет:Рецепт {name: 'Омлет', время_приготовления: 10})
-            CREATE (рис:Рецепт {name: 'Рис', время_приготовления: 18})
-
-            CREATE (вода:Ингредиент {name: 'Вода', количество: '1.5л'})
-            CREATE (овощи:Ингредиент {name: 'Овощи', количество: '300г'})
-            CREATE (картофель:Ингредиент {name: 'Картофель', количество: '200г'})
-            CREATE (специи:Ингредиент {name: 'Специи', количество: 'по вкусу'})
-            CREATE (макароны_инг:Ингредиент {name: 'Макароны', количество: '200г'})
-            CREATE (яйца:Ингредиент {name: 'Яйца', количество: '3шт'})
-            CREATE (рис_инг:Ингредиент {name: 'Рис', количество: '150г'})
-
-            CREATE (плита:КухонныйПрибор {name: 'Плита', состояние: 'выключена', мощность: 0})
-            CREATE (сковорода:КухонныйПрибор {name: 'Сковорода', состояние: 'не используется', температура: 0})
-            CREATE (кастрюля:КухонныйПрибор {name: 'Кастрюля', состояние: 'не используется', температура: 0})
-            """)
-
-            # Создание связей между рецептами и ингредиентами
-            session.run("""
-            MATCH (суп:Рецепт {name: 'Суп'})
-            MATCH (вода:Ингредиент {name: 'Вода'})
-            MATCH (овощи:Ингредиент {name: 'Овощи'})
-            MATCH (картофель:Ингредиент {name: 'Картофель'})
-            MATCH (специи:Ингредиент {name: 'Специи'})
-            CREATE (суп)-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(вода)
-            CREATE (суп)-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(овощи)
-            CREATE (суп)-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(картофель)
-            CREATE (суп)-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(специи)
-            """)
-
             # Добавление нечетких правил
             session.run("""
             CREATE (правило1:НечеткоеПравило {
@@ -146,96 +729,111 @@ class Neo4jDB:
             })
             """)
 
-    def add_cooking_rules(self):
-        """Добавление правил приготовления в онтологию"""
-        with self.driver.session() as session:
-            # Правила для супа с нечеткой логикой
-            soup_rules = [
-                {"time": 1, "condition": "Начать приготовление", "action": "Включить плиту",
-                 "message": "🔥 Плита включена, вода начинает нагреваться", "fuzzy_power": 80},
-                {"time": 3, "condition": "Вода нагрета", "action": "Добавить овощи",
-                 "message": "🥕 Овощи добавлены в суп", "fuzzy_power": 70},
-                {"time": 5, "condition": "Овощи готовятся", "action": "Добавить картофель",
-                 "message": "🥔 Картофель добавлен в суп", "fuzzy_power": 65},
-                {"time": 8, "condition": "Картофель готовится", "action": "Добавить специи",
-                 "message": "🧂 Специи добавлены", "fuzzy_power": 60},
-                {"time": 12, "condition": "Ингредиенты готовы", "action": "Перемешать",
-                 "message": "🥄 Суп перемешан", "fuzzy_power": 55},
-                {"time": 15, "condition": "Суп кипит", "action": "Убавить огонь",
-                 "message": "♨️ Огонь уменьшен для томления", "fuzzy_power": 40},
-                {"time": 18, "condition": "Суп готовится", "action": "Проверить густоту",
-                 "message": "💧 Проверка густоты супа", "fuzzy_power": 35},
-                {"time": 20, "condition": "Приготовление завершено", "action": "Выключить плиту",
-                 "message": "✅ Суп готов! Подавать к столу", "fuzzy_power": 0}
-            ]
-
-            for rule in soup_rules:
-                session.run("""
-                MATCH (рецепт:Рецепт {name: 'Суп'})
-                CREATE (правило:Правило {
-                    время: $time,
-                    условие: $condition,
-                    действие: $action,
-                    сообщение: $message,
-                    нечеткая_мощность: $fuzzy_power
-                })
-                CREATE (рецепт)-[:ИМЕЕТ_ПРАВИЛО]->(правило)
-                """, time=rule["time"], condition=rule["condition"],
-                            action=rule["action"], message=rule["message"],
-                            fuzzy_power=rule["fuzzy_power"])
+            # Правила нечеткого вывода мощности в виде данных (для FuzzyRuleBase.from_records)
+            session.run("""
+            UNWIND $rules AS rule
+            CREATE (:НечеткоеПравило {
+                название: rule.name,
+                переменные: rule.variables,
+                термы: rule.terms,
+                выход: rule.then,
+                операция: rule.op,
+                тип: 'нечеткое'
+            })
+            """, rules=self.fuzzy_rule_records())
+
+        # Создание конкретных экземпляров и связей рецептов с ингредиентами
+        self.load_ontology(self.RECIPES, self.INGREDIENTS, self.APPLIANCES)
+
+    def add_cooking_rules(self, recipe_rules=None, batch_size=None):
+        """Добавление правил приготовления в онтологию.
+        recipe_rules — {рецепт: [правила]}; все правила уходят UNWIND-пачками в одной транзакции."""
+        if recipe_rules is None:
+            recipe_rules = self.COOKING_RULES
+
+        rows = [dict(rule, recipe=recipe) for recipe, rules in recipe_rules.items() for rule in rules]
+        self.write_batches([("""
+            UNWIND $rows AS row
+            MATCH (рецепт:Рецепт {name: row.recipe})
+            CREATE (правило:Правило {
+                время: row.time,
+                условие: row.condition,
+                действие: row.action,
+                сообщение: row.message,
+                нечеткая_мощность: row.fuzzy_power
+            })
+            CREATE (рецепт)-[:ИМЕЕТ_ПРАВИЛО]->(правило)
+            """, rows)], batch_size)
 
-    def get_recipe_steps(self, recipe_name):
-        """Получение шагов рецепта из базы знаний"""
-        with self.driver.session() as session:
-            result = session.run("""
+    RECIPE_STEPS_QUERY = """
             MATCH (р:Рецепт {name: $name})-[:ИМЕЕТ_ПРАВИЛО]->(п:Правило)
             RETURN п.время as time, п.условие as condition, 
                    п.действие as action, п.сообщение as message,
                    п.нечеткая_мощность as fuzzy_power
             ORDER BY п.время
-            """, name=recipe_name)
+            """
+
+    def get_recipe_steps(self, recipe_name):
+        """Получение шагов рецепта из базы знаний"""
+        with self.driver.session() as session:
+            result = session.run(self.RECIPE_STEPS_QUERY, name=recipe_name)
 
             steps = []
             for record in result:
-                steps.append({
-                    "time": record["time"],
-                    "condition": record["condition"],
-                    "action": record["action"],
-                    "message": record["message"],
-                    "fuzzy_power": record["fuzzy_power"] if record["fuzzy_power"] else 50
-                })
+                steps.append(self.step_from_record(record))
 
             if not steps:
                 steps = self._get_local_recipe_steps(recipe_name)
 
             return steps
 
-    def _get_local_recipe_steps(self, recipe_name):
-        """Локальные рецепты (резервный вариант)"""
-        recipes_db = {
-            "Суп": [
-                {"time": 1, "condition": "Начать приготовление", "action": "Включить плиту",
-                 "message": "🔥 Плита включена, вода начинает нагреваться", "fuzzy_power": 80},
-                {"time": 3, "condition": "Вода нагрета", "action": "Добавить овощи",
-                 "message": "🥕 Овощи добавлены в суп", "fuzzy_power": 70},
-                {"time": 5, "condition": "Овощи готовятся", "action": "Добавить картофель",
-                 "message": "🥔 Картофель добавлен в суп", "fuzzy_power": 65},
-                {"time": 8, "condition": "Картофель готовится", "action": "Добавить специи",
-                 "message": "🧂 Специи добавлены", "fuzzy_power": 60},
-                {"time": 12, "condition": "Ингредиенты готовы", "action": "Перемешать",
-                 "message": "🥄 Суп перемешан", "fuzzy_power": 55},
-                {"time": 15, "condition": "Суп кипит", "action": "Убавить огонь",
-                 "message": "♨️ Огонь уменьшен для томления", "fuzzy_power": 40},
-                {"time": 18, "condition": "Суп готовится", "action": "Проверить густоту",
-                 "message": "💧 Проверка густоты супа", "fuzzy_power": 35},
-                {"time": 20, "condition": "Приготовление завершено", "action": "Выключить плиту",
-                 "message": "✅ Суп готов! Подавать к столу", "fuzzy_power": 0}
-            ]
-        }
-        return recipes_db.get(recipe_name, [])
+    def get_fuzzy_rules(self):
+        """Правила нечеткого вывода, сохранённые в онтологии как узлы НечеткоеПравило"""
+        with self.driver.session() as session:
+            result = session.run("""
+            MATCH (п:НечеткоеПравило)
+            WHERE п.переменные IS NOT NULL
+            RETURN п.название as name, п.переменные as variables, п.термы as terms,
+                   п.выход as then, п.операция as op
+            """)
+            return [record.data() for record in result]
+
+    def log_events(self, kind, rows):
+        """Запись событий LogBuffer.QUERIES[kind] ("log", "completion", "appliance"): через буфер, если он включен"""
+        if self.log_buffer is not None:
+            for row in rows:
+                self.log_buffer.add(kind, row)
+            return
+        self.write_batches([(LogBuffer.QUERIES[kind], rows)])
+
+    def get_recipe_ingredients(self, recipe_name):
+        with self.driver.session() as session:
+            result = session.run("""
+            MATCH (р:Рецепт {name: $name})-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(и:Ингредиент)
+            RETURN и.name as name, и.количество as quantity
+            """, name=recipe_name)
+            return [(record["name"], record["quantity"]) for record in result]
+
+    def get_cooking_history(self, recipe_name):
+        with self.driver.session() as session:
+            result = session.run("""
+            MATCH (л:Лог)
+            WHERE л.рецепт = $recipe
+            RETURN л.время as time, л.действие as action, 
+                   л.сообщение as message, л.нечеткая_мощность as power,
+                   л.температура as temperature
+            ORDER BY л.время
+            """, recipe=recipe_name)
+            return [record.data() for record in result]
 
     def update_appliance_state(self, appliance_name, state, power=None, temperature=None):
         """Обновление состояния кухонного прибора"""
+        if self.log_buffer is not None:
+            if power is not None:
+                self.log_buffer.add("appliance", {"name": appliance_name, "state": state, "power": power})
+            elif temperature is not None:
+                self.log_buffer.add("appliance", {"name": appliance_name, "state": state, "temperature": temperature})
+            return
         with self.driver.session() as session:
             if power is not None:
                 session.run("""
@@ -249,39 +847,218 @@ class Neo4jDB:
                 """, name=appliance_name, state=state, temperature=temperature)
 
 
+# --- Хранилище в памяти ---
+class InMemoryKitchenStore(KitchenStore):
+    """Онтология кухни в словарях с индексами по имени: те же методы, что у Neo4jDB, без сервера.
+    Подходит для тестов, бенчмарков и сравнения с Neo4j на той же нагрузке."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Очищает хранилище"""
+        self.recipes = {}        # имя -> {"time", "ingredients": [имена], "rules": [шаги]}
+        self.ingredients = {}    # имя -> {"amount"}
+        self.appliances = {}     # имя -> {"state", "power", "temperature"}
+        self.fuzzy_rules = []
+        self.logs = {}           # рецепт -> [записи Лог]
+        self.completions = []
+
+    def setup_kitchen_ontology(self):
+        self.reset()
+        self.fuzzy_rules = self.fuzzy_rule_records()
+        self.load_ontology(self.RECIPES, self.INGREDIENTS, self.APPLIANCES)
+
+    def load_ontology(self, recipes=(), ingredients=(), appliances=(), batch_size=None):
+        for ingredient in ingredients:
+            self.ingredients[ingredient["name"]] = {"amount": ingredient.get("amount")}
+        for appliance in appliances:
+            self.appliances[appliance["name"]] = {"state": appliance.get("state"), "power": appliance.get("power"),
+                                                  "temperature": appliance.get("temperature")}
+        for recipe in recipes:
+            entry = self.recipes.setdefault(recipe["name"], {"rules": [], "ingredients": []})
+            entry["time"] = recipe.get("time")
+            for name in recipe.get("ingredients", []):
+                if name in self.ingredients and name not in entry["ingredients"]:
+                    entry["ingredients"].append(name)
+
+    def add_cooking_rules(self, recipe_rules=None, batch_size=None):
+        if recipe_rules is None:
+            recipe_rules = self.COOKING_RULES
+        for recipe, rules in recipe_rules.items():
+            if recipe in self.recipes:
+                self.recipes[recipe]["rules"].extend(dict(rule) for rule in rules)
+
+    def get_recipe_steps(self, recipe_name):
+        recipe = self.recipes.get(recipe_name)
+        steps = [self.step_from_record(rule) for rule in sorted(recipe["rules"], key=lambda rule: rule["time"])] \
+            if recipe else []
+        return steps or self._get_local_recipe_steps(recipe_name)
+
+    def get_recipe_ingredients(self, recipe_name):
+        recipe = self.recipes.get(recipe_name)
+        if recipe is None:
+            return []
+        return [(name, self.ingredients[name]["amount"]) for name in recipe["ingredients"]]
+
+    def get_fuzzy_rules(self):
+        return [dict(rule) for rule in self.fuzzy_rules]
+
+    def update_appliance_state(self, appliance_name, state, power=None, temperature=None):
+        appliance = self.appliances.get(appliance_name)
+        if appliance is None:
+            return
+        if power is not None:
+            appliance.update(state=state, power=power)
+        elif temperature is not None:
+            appliance.update(state=state, temperature=temperature)
+
+    def log_events(self, kind, rows):
+        for row in rows:
+            row = dict(row, timestamp=row.get("timestamp", int(time.time() * 1000)))
+            if kind == "log":
+                self.logs.setdefault(row["recipe"], []).append(row)
+            elif kind == "completion":
+                self.completions.append(row)
+            elif kind == "appliance":
+                self.update_appliance_state(row["name"], row["state"], row.get("power"), row.get("temperature"))
+
+    def get_cooking_history(self, recipe_name):
+        return [{"time": row["time"], "action": row["action"], "message": row["message"],
+                 "power": row["fuzzy_power"], "temperature": row["temperature"]}
+                for row in sorted(self.logs.get(recipe_name, []), key=lambda row: row["time"])]
+
+
+# --- Тепловая модель парка приборов ---
+class ThermalFleet:
+    """Температуры N приборов как массив: тот же линейный закон, что в simulate_temperature_change
+    (нагрев heating * мощность за минуту, остывание cooling за минуту, ограничение t_min..t_max),
+    но с параметрами на каждый прибор и одним векторным шагом на весь парк.
+    Параметры по умолчанию (None) — константы SmartKitchenSimulator.
+    substeps — число шагов интегрирования на минуту."""
+
+    def __init__(self, temperatures, heating=None, cooling=None, t_min=None, t_max=None, substeps=1):
+        law = SmartKitchenSimulator
+        heating = law.HEATING if heating is None else heating
+        cooling = law.COOLING if cooling is None else cooling
+        t_min = law.MIN_TEMPERATURE if t_min is None else t_min
+        t_max = law.MAX_TEMPERATURE if t_max is None else t_max
+        self.temperatures = np.array(temperatures, dtype=float)
+        n = len(self.temperatures)
+        self.heating = np.broadcast_to(np.asarray(heating, dtype=float), n)
+        self.cooling = np.broadcast_to(np.asarray(cooling, dtype=float), n)
+        self.t_min = np.broadcast_to(np.asarray(t_min, dtype=float), n)
+        self.t_max = np.broadcast_to(np.asarray(t_max, dtype=float), n)
+        self.substeps = substeps
+
+    def rates(self, powers):
+        """Скорость изменения температуры (°C/мин) при данных мощностях"""
+        powers = np.asarray(powers, dtype=float)
+        return np.where(powers > 0, self.heating * powers, -self.cooling)
+
+    def step(self, powers, minutes=1, trajectory=False):
+        """Продвигает все температуры на minutes минут; trajectory=True — вернуть температуры после каждого подшага"""
+        rates = self.rates(powers)
+        dt = 1.0 / self.substeps
+        states = []
+        for _ in range(int(minutes * self.substeps)):
+            np.clip(self.temperatures + rates * dt, self.t_min, self.t_max, out=self.temperatures)
+            if trajectory:
+                states.append(self.temperatures.copy())
+        return np.array(states) if trajectory else self.temperatures
+
+
+# --- Часы симуляции ---
+class RealTimeClock:
+    """Часы реального времени: минута симуляции длится seconds_per_minute секунд"""
+    event_driven = False
+
+    def __init__(self, seconds_per_minute=60.0):
+        self.seconds_per_minute = seconds_per_minute
+        self.now = 0  # Минуты симуляции
+
+    def wait(self, minutes=1):
+        time.sleep(minutes * self.seconds_per_minute)
+        self.now += minutes
+
+
+class ScaledClock(RealTimeClock):
+    """Ускоренные часы: speedup минут симуляции за минуту реального времени"""
+
+    def __init__(self, speedup=120):
+        super().__init__(60.0 / speedup)
+
+
+class VirtualClock(RealTimeClock):
+    """Виртуальные часы без ожидания: симулятор перескакивает сразу к следующему событию рецепта"""
+    event_driven = True
+
+    def __init__(self):
+        super().__init__(0)
+
+    def wait(self, minutes=1):
+        self.now += minutes
+
+
 # --- Симулятор умной кухни с нечеткой логикой ---
 class SmartKitchenSimulator:
-    def __init__(self, db, recipe_name):
+    # Тепловая модель: нагрев (°C за минуту на 1 % мощности), остывание (°C за минуту), границы (°C)
+    HEATING = 0.1
+    COOLING = 0.5
+    MIN_TEMPERATURE = 20
+    MAX_TEMPERATURE = 100
+
+    def __init__(self, db, recipe_name, rule_base=None, clock=None, recipe=None):
         self.db = db
         self.recipe_name = recipe_name
-        self.recipe = self.db.get_recipe_steps(recipe_name)
+        self.recipe = recipe if recipe is not None else self.db.get_recipe_steps(recipe_name)
         self.time_elapsed = 0
         self.step_index = 0
-        self.fuzzy_logic = FuzzyLogic()
-        self.current_temperature = 20  # Начальная температура
+        self.rule_base = rule_base if rule_base is not None else FuzzyLogic.engine()
+        self.current_temperature = self.MIN_TEMPERATURE  # Начальная температура
         self.current_power = 0
+        # По умолчанию минута симуляции длится 0.5 с
+        self.clock = clock if clock is not None else ScaledClock(120)
 
-    def run(self):
+    def run(self, clock=None, verbose=True):
+        """Приготовление по рецепту. clock — часы симуляции (по умолчанию self.clock);
+        verbose=False отключает вывод (для массовых прогонов)."""
+        clock = clock if clock is not None else self.clock
         if not self.recipe:
-            print(f"❌ Рецепт '{self.recipe_name}' не найден")
+            if verbose:
+                print(f"❌ Рецепт '{self.recipe_name}' не найден")
             return
 
-        print(f"\n=== Умная кухня с нечеткой логикой: Приготовление {self.recipe_name} ===")
-
-        self.show_ingredients()
+        if verbose:
+            print(f"\n=== Умная кухня с нечеткой логикой: Приготовление {self.recipe_name} ===")
+            self.show_ingredients()
 
         while self.step_index < len(self.recipe):
-            self.time_elapsed += 1
             current_step = self.recipe[self.step_index]
 
+            # Между шагами рецепта мощность постоянна: виртуальные часы проходят эти минуты одним прыжком
+            gap = current_step["time"] - self.time_elapsed - 1
+            if clock.event_driven and gap > 0:
+                self.advance_temperature(gap)
+                self.time_elapsed += gap
+                clock.wait(gap)
+                if verbose:
+                    progress = (self.time_elapsed / self.recipe[-1]["time"]) * 100
+                    print(f"[{self.time_elapsed} мин] ... процесс готовки идет ... "
+                          f"(Температура: {self.current_temperature:.1f}°C, Прогресс: {progress:.1f}%)")
+                continue
+
+            self.time_elapsed += 1
+
             if self.time_elapsed == current_step["time"]:
                 # Применяем нечеткую логику для определения мощности
                 fuzzy_power = self.apply_fuzzy_logic(current_step)
 
-                print(f"[{self.time_elapsed} мин] Условие: {current_step['condition']}")
-                print(f"          Действие: {current_step['action']}")
-                print(f"          Мощность нагрева: {fuzzy_power:.1f}% (нечеткая логика)")
-                print(f"          {current_step['message']}")
+                if verbose:
+                    print(f"[{self.time_elapsed} мин] Условие: {current_step['condition']}")
+                    print(f"          Действие: {current_step['action']}")
+                    print(f"          Мощность нагрева: {fuzzy_power:.1f}% (нечеткая логика)")
+                    print(f"          {current_step['message']}")
 
                 self.step_index += 1
                 self.log_step_to_neo4j(current_step, fuzzy_power)
@@ -291,40 +1068,24 @@ class SmartKitchenSimulator:
             else:
                 # Симуляция изменения температуры на основе текущей мощности
                 self.simulate_temperature_change()
-                progress = (self.time_elapsed / self.recipe[-1]["time"]) * 100
-                print(f"[{self.time_elapsed} мин] ... процесс готовки идет ... "
-                      f"(Температура: {self.current_temperature:.1f}°C, Прогресс: {progress:.1f}%)")
+                if verbose:
+                    progress = (self.time_elapsed / self.recipe[-1]["time"]) * 100
+                    print(f"[{self.time_elapsed} мин] ... процесс готовки идет ... "
+                          f"(Температура: {self.current_temperature:.1f}°C, Прогресс: {progress:.1f}%)")
 
-            time.sleep(0.5)
+            clock.wait(1)
 
-        print(f"\n✅ {self.recipe_name} готов! Приятного аппетита!")
+        if verbose:
+            print(f"\n✅ {self.recipe_name} готов! Приятного аппетита!")
         self.log_completion_to_neo4j()
 
     def apply_fuzzy_logic(self, step):
         """Применение нечеткой логики для определения мощности нагрева"""
-        # Фаззификация входных параметров
+        # Входные параметры
         progress = (self.time_elapsed / self.recipe[-1]["time"]) * 100
 
-        temp_fuzzy = self.fuzzy_logic.fuzzify_temperature(self.current_temperature)
-        progress_fuzzy = self.fuzzy_logic.fuzzify_cooking_progress(progress)
-
-        # Формирование правил нечеткого вывода
-        rules_output = {}
-
-        # Правило 1: Если холодно И начало -> высокая мощность
-        if temp_fuzzy['cold'] > 0 and progress_fuzzy['start'] > 0:
-            rules_output['cold_high'] = min(temp_fuzzy['cold'], progress_fuzzy['start'])
-
-        # Правило 2: Если тепло И середина -> средняя мощность
-        if temp_fuzzy['warm'] > 0 and progress_fuzzy['middle'] > 0:
-            rules_output['warm_medium'] = min(temp_fuzzy['warm'], progress_fuzzy['middle'])
-
-        # Правило 3: Если горячо И конец -> низкая мощность
-        if temp_fuzzy['hot'] > 0 and progress_fuzzy['end'] > 0:
-            rules_output['hot_low'] = min(temp_fuzzy['hot'], progress_fuzzy['end'])
-
-        # Дефаззификация
-        fuzzy_power = self.fuzzy_logic.defuzzify_heat_power(rules_output)
+        # Фаззификация, срабатывание правил и дефаззификация — база правил FuzzyLogic.RULES
+        fuzzy_power = FuzzyLogic.infer_power(self.rule_base, self.current_temperature, progress)
 
         # Комбинируем с эталонной мощностью из базы знаний
         base_power = step.get("fuzzy_power", 50)
@@ -333,72 +1094,229 @@ class SmartKitchenSimulator:
         self.current_power = combined_power
         return combined_power
 
+    @staticmethod
+    def apply_fuzzy_logic_batch(simulators, steps):
+        """apply_fuzzy_logic для многих симуляторов сразу: один пакетный вывод на каждую базу правил.
+        steps[i] — текущий шаг рецепта simulators[i]; возвращает список мощностей."""
+        powers = [0.0] * len(simulators)
+        groups = {}
+        for i, simulator in enumerate(simulators):
+            groups.setdefault(id(simulator.rule_base), []).append(i)
+        for indices in groups.values():
+            rule_base = simulators[indices[0]].rule_base
+            temperatures = np.array([simulators[i].current_temperature for i in indices], dtype=float)
+            progresses = np.array([simulators[i].time_elapsed / simulators[i].recipe[-1]["time"] * 100
+                                   for i in indices], dtype=float)
+            base_powers = np.array([steps[i].get("fuzzy_power", 50) for i in indices], dtype=float)
+            combined = (rule_base.infer({'temperature': temperatures, 'progress': progresses}) + base_powers) / 2
+            for i, power in zip(indices, combined.tolist()):
+                simulators[i].current_power = power
+                powers[i] = power
+        return powers
+
+    def advance_temperature(self, minutes):
+        """Изменение температуры за несколько минут при постоянной мощности (в замкнутой форме):
+        температура меняется линейно и упирается в границы, поэтому достаточно одного шага"""
+        rate = self.current_power * self.HEATING if self.current_power > 0 else -self.COOLING
+        self.current_temperature = max(self.MIN_TEMPERATURE,
+                                       min(self.MAX_TEMPERATURE, self.current_temperature + rate * minutes))
+
     def simulate_temperature_change(self):
         """Симуляция изменения температуры на основе мощности"""
         if self.current_power > 0:
             # Температура увеличивается пропорционально мощности
-            temp_increase = self.current_power * 0.1
+            temp_increase = self.current_power * self.HEATING
             self.current_temperature += temp_increase
         else:
             # Естественное охлаждение
-            self.current_temperature -= 0.5
+            self.current_temperature -= self.COOLING
 
         # Ограничения температуры
-        self.current_temperature = max(20, min(100, self.current_temperature))
+        self.current_temperature = max(self.MIN_TEMPERATURE, min(self.MAX_TEMPERATURE, self.current_temperature))
 
     def show_ingredients(self):
         """Показать необходимые ингредиенты из базы знаний"""
-        with self.db.driver.session() as session:
-            result = session.run("""
-            MATCH (р:Рецепт {name: $name})-[:ТРЕБУЕТ_ИНГРЕДИЕНТ]->(и:Ингредиент)
-            RETURN и.name as name, и.количество as quantity
-            """, name=self.recipe_name)
-
-            print("Необходимые ингредиенты:")
-            ingredients_found = False
-            for record in result:
-                print(f"  - {record['name']}: {record['quantity']}")
-                ingredients_found = True
+        print("Необходимые ингредиенты:")
+        ingredients = self.db.get_recipe_ingredients(self.recipe_name)
+        for name, quantity in ingredients:
+            print(f"  - {name}: {quantity}")
 
-            if not ingredients_found:
-                print("  (ингредиенты не найдены в базе знаний)")
+        if not ingredients:
+            print("  (ингредиенты не найдены в базе знаний)")
 
     def log_step_to_neo4j(self, step, fuzzy_power):
         """Логирование выполненного шага в Neo4j"""
         try:
-            with self.db.driver.session() as session:
-                session.run("""
-                CREATE (л:Лог {
-                    рецепт: $recipe,
-                    время: $time,
-                    действие: $action,
-                    сообщение: $message,
-                    нечеткая_мощность: $fuzzy_power,
-                    температура: $temperature,
-                    timestamp: timestamp()
-                })
-                """, recipe=self.recipe_name, time=self.time_elapsed,
-                            action=step["action"], message=step["message"],
-                            fuzzy_power=fuzzy_power, temperature=self.current_temperature)
+            self.db.log_events("log", [{"recipe": self.recipe_name, "time": self.time_elapsed,
+                                        "action": step["action"], "message": step["message"],
+                                        "fuzzy_power": fuzzy_power, "temperature": self.current_temperature,
+                                        "timestamp": int(time.time() * 1000)}])
         except Exception as e:
             print(f"⚠️ Ошибка логирования: {e}")
 
     def log_completion_to_neo4j(self):
         """Логирование завершения приготовления"""
         try:
-            with self.db.driver.session() as session:
-                session.run("""
-                CREATE (з:Завершение {
-                    рецепт: $recipe,
-                    общее_время: $total_time,
-                    статус: 'успешно',
-                    timestamp: timestamp()
-                })
-                """, recipe=self.recipe_name, total_time=self.time_elapsed)
+            self.db.log_events("completion", [{"recipe": self.recipe_name, "total_time": self.time_elapsed,
+                                               "timestamp": int(time.time() * 1000)}])
         except Exception as e:
             print(f"⚠️ Ошибка логирования завершения: {e}")
 
 
+# --- Асинхронная симуляция многих кухонь ---
+class AsyncNeo4jStore:
+    """Асинхронное хранилище на AsyncGraphDatabase (драйвер neo4j 5.x)"""
+
+    def __init__(self, uri, user, password):
+        from neo4j import AsyncGraphDatabase
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password))
+
+    async def close(self):
+        await self.driver.close()
+
+    async def get_recipe_steps(self, recipe_name):
+        async with self.driver.session() as session:
+            result = await session.run(Neo4jDB.RECIPE_STEPS_QUERY, name=recipe_name)
+            steps = [KitchenStore.step_from_record(record) async for record in result]
+        return steps or Neo4jDB._get_local_recipe_steps(recipe_name)
+
+    async def log_events(self, kind, rows):
+        async with self.driver.session() as session:
+            result = await session.run(LogBuffer.QUERIES[kind], rows=rows)
+            await result.consume()
+
+
+class ThreadedStore:
+    """Асинхронная обертка над синхронным хранилищем (Neo4jDB): вызовы уходят в поток через asyncio.to_thread"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def close(self):
+        pass
+
+    async def get_recipe_steps(self, recipe_name):
+        return await asyncio.to_thread(self.db.get_recipe_steps, recipe_name)
+
+    async def log_events(self, kind, rows):
+        await asyncio.to_thread(self.db.log_events, kind, rows)
+
+
+class AsyncKitchenSimulator(SmartKitchenSimulator):
+    """Симулятор одной кухни для цикла asyncio: асинхронные паузы, а логи и состояние прибора
+    пишет отдельная задача-писатель, так что ожидание базы не задерживает готовку"""
+
+    def __init__(self, store, recipe_name, kitchen, rule_base=None, seconds_per_minute=0.5, appliance="Плита"):
+        super().__init__(None, recipe_name, rule_base, VirtualClock(), recipe=[])
+        self.store = store
+        self.kitchen = kitchen
+        self.appliance = appliance
+        self.seconds_per_minute = seconds_per_minute
+        self.done = False
+
+    def progress(self):
+        total = self.recipe[-1]["time"] if self.recipe else 0
+        return {"recipe": self.recipe_name, "minute": self.time_elapsed,
+                "progress": self.time_elapsed / total * 100 if total else 0.0,
+                "step": self.step_index, "steps": len(self.recipe),
+                "temperature": self.current_temperature, "power": self.current_power, "done": self.done}
+
+    async def _writer(self, events):
+        # События пишутся по порядку, чтобы состояние прибора не перезаписалось старым
+        while True:
+            event = await events.get()
+            if event is None:
+                return
+            try:
+                await self.store.log_events(*event)
+            except Exception as e:
+                print(f"⚠️ Ошибка логирования ({self.kitchen}): {e}")
+
+    async def run(self, verbose=False):
+        if not self.recipe:
+            self.recipe = await self.store.get_recipe_steps(self.recipe_name)
+        if not self.recipe:
+            if verbose:
+                print(f"❌ {self.kitchen}: рецепт '{self.recipe_name}' не найден")
+            self.done = True
+            return
+
+        events = asyncio.Queue()
+        writer = asyncio.create_task(self._writer(events))
+        try:
+            while self.step_index < len(self.recipe):
+                await asyncio.sleep(self.seconds_per_minute)
+                self.time_elapsed += 1
+                current_step = self.recipe[self.step_index]
+
+                if self.time_elapsed == current_step["time"]:
+                    fuzzy_power = self.apply_fuzzy_logic(current_step)
+                    if verbose:
+                        print(f"[{self.kitchen}, {self.time_elapsed} мин] {current_step['action']} "
+                              f"(мощность {fuzzy_power:.1f}%)")
+                    self.step_index += 1
+                    events.put_nowait(("log", [{
+                        "recipe": self.recipe_name, "time": self.time_elapsed,
+                        "action": current_step["action"], "message": current_step["message"],
+                        "fuzzy_power": fuzzy_power, "temperature": self.current_temperature,
+                        "timestamp": int(time.time() * 1000)}]))
+                    events.put_nowait(("appliance", [{"name": self.appliance, "state": "включена",
+                                                      "power": fuzzy_power, "temperature": None}]))
+                else:
+                    self.simulate_temperature_change()
+
+            events.put_nowait(("completion", [{"recipe": self.recipe_name, "total_time": self.time_elapsed,
+                                               "timestamp": int(time.time() * 1000)}]))
+            self.done = True
+            if verbose:
+                print(f"✅ {self.kitchen}: {self.recipe_name} готов!")
+        finally:
+            events.put_nowait(None)
+            await writer
+
+
+class KitchenScheduler:
+    """Запускает много AsyncKitchenSimulator в одном цикле событий и периодически печатает прогресс кухонь"""
+
+    def __init__(self, store, report_interval=1.0):
+        self.store = store
+        self.report_interval = report_interval
+        self.simulators = []
+
+    def add(self, recipe_name, kitchen=None, **kwargs):
+        kitchen = kitchen or f"Кухня {len(self.simulators) + 1}"
+        simulator = AsyncKitchenSimulator(self.store, recipe_name, kitchen, **kwargs)
+        self.simulators.append(simulator)
+        return simulator
+
+    def progress(self):
+        """Прогресс по кухням: {кухня: {рецепт, минута, %, шаг, температура, мощность, готово}}"""
+        return {simulator.kitchen: simulator.progress() for simulator in self.simulators}
+
+    def report(self):
+        progress = self.progress()
+        finished = sum(state["done"] for state in progress.values())
+        print(f"📊 Готово кухонь: {finished}/{len(progress)}")
+        for kitchen, state in progress.items():
+            if not state["done"]:
+                print(f"  {kitchen}: {state['recipe']} — {state['progress']:.0f}% "
+                      f"(шаг {state['step']}/{state['steps']}, {state['temperature']:.1f}°C)")
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    async def run(self, verbose=False):
+        reporter = asyncio.create_task(self._reporter()) if self.report_interval else None
+        try:
+            await asyncio.gather(*(simulator.run(verbose) for simulator in self.simulators))
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+        return self.progress()
+
+
 # --- Основной запуск ---
 if __name__ == "__main__":
     # Инициализация базы данных
@@ -409,7 +1327,10 @@ if __name__ == "__main__":
         print("Настройка онтологии умной кухни в Neo4j...")
         db.setup_kitchen_ontology()
         db.add_cooking_rules()
+        db.start_log_buffer()
         print("✅ Онтология создана!")
+        for item in db.ensure_schema(verify_only=True):
+            print(f"  {item['kind']} {item['label']}.{item['property']}: {item['status']}")
 
         # Выбор рецепта
         available_recipes = ["Суп", "Макароны"]
@@ -418,31 +1339,24 @@ if __name__ == "__main__":
         choice = input("Выберите рецепт: ").strip().capitalize()
 
         if choice in available_recipes:
-            # Запуск симулятора с нечеткой логикой
-            simulator = SmartKitchenSimulator(db, choice)
+            # Запуск симулятора с нечеткой логикой (правила — из базы знаний, если они там есть)
+            fuzzy_rules = db.get_fuzzy_rules()
+            rule_base = FuzzyRuleBase.from_records(FuzzyLogic.input_variables(), FuzzyLogic.POWER_OUTPUT,
+                                                   fuzzy_rules) if fuzzy_rules else None
+            simulator = SmartKitchenSimulator(db, choice, rule_base)
             simulator.run()
+            db.flush_logs()
 
             # Показать историю приготовления из Neo4j
             print(f"\n📊 История приготовления '{choice}' (с нечеткой логикой):")
-            with db.driver.session() as session:
-                result = session.run("""
-                MATCH (л:Лог)
-                WHERE л.рецепт = $recipe
-                RETURN л.время as time, л.действие as action, 
-                       л.сообщение as message, л.нечеткая_мощность as power,
-                       л.температура as temperature
-                ORDER BY л.время
-                """, recipe=choice)
-
-                logs_found = False
-                for record in result:
-                    print(f"  {record['time']} мин: {record['action']} - "
-                          f"Мощность: {record['power']:.1f}% - "
-                          f"Температура: {record['temperature']:.1f}°C")
-                    logs_found = True
-
-                if not logs_found:
-                    print("  (история не найдена)")
+            history = db.get_cooking_history(choice)
+            for record in history:
+                print(f"  {record['time']} мин: {record['action']} - "
+                      f"Мощность: {record['power']:.1f}% - "
+                      f"Температура: {record['temperature']:.1f}°C")
+
+            if not history:
+                print("  (история не найдена)")
 
         else:
             print("❌ Рецепт не найден в базе знаний")
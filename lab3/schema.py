@@ -0,0 +1,33 @@
+"""Индексы и ограничения схемы Neo4j — общие для main.py и example.py.
+
+Схема задается списком (имя, вид, метка, свойство): вид 'unique' — ограничение уникальности,
+'index' — range-индекс по одному свойству.
+"""
+
+SHOW_INDEXES = """
+SHOW INDEXES YIELD labelsOrTypes, properties, state, owningConstraint
+WHERE size(properties) = 1
+RETURN labelsOrTypes[0] AS label, properties[0] AS property, state,
+       owningConstraint IS NOT NULL AS unique
+"""
+
+
+def ensure_schema(driver, schema, verify_only=False):
+    """Идемпотентно создает индексы и ограничения schema (IF NOT EXISTS).
+    verify_only=True — ничего не создает, только отчет о том, что есть в базе и в каком состоянии.
+    Возвращает отчет [{name, kind, label, property, status}]; status 'отсутствует' — нет в базе."""
+    with driver.session() as session:
+        if not verify_only:
+            for name, kind, label, prop in schema:
+                if kind == "unique":
+                    session.run(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE")
+                else:
+                    session.run(f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})")
+
+        existing = {}
+        for record in session.run(SHOW_INDEXES):
+            existing[(record["label"], record["property"], record["unique"])] = record["state"]
+
+    return [{"name": name, "kind": kind, "label": label, "property": prop,
+             "status": existing.get((label, prop, kind == "unique"), "отсутствует")}
+            for name, kind, label, prop in schema]